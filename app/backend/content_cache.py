@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .storage import StorageBackend, get_storage
+
+
+class DocumentContentCache:
+    """
+    Two-tier read-through cache of document markdown: an in-process LRU bounded by a
+    byte budget, then a local-disk tier, then the storage backend
+
+    Every entry carries the SHA-256 of its markdown as its version. When the caller
+    knows the current version (from the document manifest), a matching entry is
+    served without touching storage and a re-ingested document misses automatically.
+    Entries without a known version are revalidated against storage with a
+    conditional GET on their ETag at most once per revalidate_seconds.
+    """
+
+    def __init__(self, storage: Optional[StorageBackend] = None, max_bytes: Optional[int] = None,
+                 cache_dir: Optional[str] = None, revalidate_seconds: Optional[int] = None):
+        self.storage = storage or get_storage()
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv("DOCUMENT_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+        )
+        cache_dir = str(cache_dir or os.getenv("DOCUMENT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "document_cache")))
+        self.cache_dir = Path(cache_dir) if cache_dir.lower() != "none" else None
+        self.revalidate_seconds = revalidate_seconds if revalidate_seconds is not None else int(
+            os.getenv("DOCUMENT_CACHE_REVALIDATE_SECONDS", "60")
+        )
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "revalidations": 0, "misses": 0}
+
+    @staticmethod
+    def _version(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _disk_paths(self, document_id: str):
+        name = hashlib.sha256(document_id.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{name}.md", self.cache_dir / f"{name}.json"
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _remember(self, document_id: str, entry: Dict[str, Any]):
+        """Put an entry in the memory tier, evicting the least recently used past the byte budget"""
+        if entry["size"] > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(document_id, None)
+            if previous is not None:
+                self._bytes -= previous["size"]
+            self._entries[document_id] = entry
+            self._bytes += entry["size"]
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["size"]
+
+    def _read_disk(self, document_id: str) -> Optional[Dict[str, Any]]:
+        if self.cache_dir is None:
+            return None
+        content_path, meta_path = self._disk_paths(document_id)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            meta["content"] = content_path.read_text(encoding="utf-8")
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, document_id: str, entry: Dict[str, Any], with_content: bool = True):
+        if self.cache_dir is None:
+            return
+        content_path, meta_path = self._disk_paths(document_id)
+        meta = {name: value for name, value in entry.items() if name != "content"}
+        files = [(content_path, entry["content"])] if with_content else []
+        files.append((meta_path, json.dumps(meta)))
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write then rename so a concurrent reader never sees a partial file
+            for path, text in files:
+                scratch = path.with_suffix(f"{path.suffix}.{os.getpid()}.{threading.get_ident()}.tmp")
+                scratch.write_text(text, encoding="utf-8")
+                os.replace(scratch, path)
+        except OSError as e:
+            print(f"Warning: Could not write document cache file: {str(e)}")
+
+    def _is_fresh(self, entry: Dict[str, Any], version: Optional[str]) -> bool:
+        if version:
+            return entry["version"] == version
+        return time.time() - entry["checked_at"] < self.revalidate_seconds
+
+    def get(self, document_id: str, filename: str, version: Optional[str] = None) -> str:
+        """
+        Get a document's markdown, reading through memory, local disk and storage
+
+        Args:
+            document_id: Document ID
+            filename: Markdown file name without extension
+            version: SHA-256 of the current markdown, if known
+
+        Returns:
+            The markdown content
+        """
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is not None:
+                self._entries.move_to_end(document_id)
+        tier = "memory_hits"
+
+        if entry is None:
+            entry = self._read_disk(document_id)
+            tier = "disk_hits"
+
+        if entry is not None and self._is_fresh(entry, version):
+            self._count(tier)
+            if tier == "disk_hits":
+                self._remember(document_id, entry)
+            return entry["content"]
+
+        # Stale or unversioned: a conditional GET only downloads the markdown if it changed
+        etag = entry["etag"] if entry is not None and not version else None
+        result = self.storage.get_markdown_if_changed(document_id, filename, etag)
+        if result is None:
+            self._count("revalidations")
+            entry = dict(entry, checked_at=time.time())
+            self._remember(document_id, entry)
+            self._write_disk(document_id, entry, with_content=False)
+            return entry["content"]
+
+        self._count("misses")
+        content, etag = result
+        entry = {
+            "content": content,
+            "etag": etag,
+            "version": self._version(content),
+            "size": len(content.encode("utf-8")),
+            "checked_at": time.time()
+        }
+        self._remember(document_id, entry)
+        self._write_disk(document_id, entry)
+        return entry["content"]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), memory_bytes=self._bytes)
@@ -0,0 +1,74 @@
+import os
+import time
+import threading
+from typing import Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Connection setup time of the current thread's in-progress request
+_connect_timing = threading.local()
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """HTTPS connection that records how long TCP + TLS setup took"""
+    
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _connect_timing.connect_ms = getattr(_connect_timing, "connect_ms", 0.0) + elapsed_ms
+        _connect_timing.new_connections = getattr(_connect_timing, "new_connections", 0) + 1
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """Keep-alive adapter whose HTTPS connections report their setup time"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": HTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def create_http_session(pool_size: int) -> requests.Session:
+    """
+    Create a requests session with a keep-alive pool shared by all threads
+    
+    Args:
+        pool_size: Maximum number of connections kept open per host
+        
+    Returns:
+        The configured session
+    """
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def reset_connect_timing():
+    """Start measuring connection setup for a new call on this thread"""
+    _connect_timing.connect_ms = 0.0
+    _connect_timing.new_connections = 0
+
+
+def get_connect_timing() -> Dict[str, Any]:
+    """Connection setup cost of the current thread's call since the last reset"""
+    return {
+        "connect_ms": getattr(_connect_timing, "connect_ms", 0.0),
+        "new_connections": getattr(_connect_timing, "new_connections", 0),
+    }
+
+
+def get_http_pool_size() -> int:
+    """Pool size for LLM provider clients, configurable per deployment"""
+    return int(os.getenv("LLM_HTTP_POOL_SIZE", "16"))
@@ -0,0 +1,127 @@
+import os
+import time
+import traceback
+from tempfile import NamedTemporaryFile
+from dotenv import load_dotenv
+from app.backend.redis_service import RedisService
+from app.backend.pdf_processor import PDFProcessor
+from app.backend.utils import DocumentStore
+from app.backend.manifest import DocumentManifest
+from app.backend.storage import get_storage
+
+# Load environment variables
+load_dotenv()
+
+class JobProgress:
+    """Reports each processing stage of an ingestion job and how long the previous one took"""
+    
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.stages = {}
+        self.current_stage = None
+        self.stage_started = None
+    
+    def _finish_current(self):
+        if self.current_stage is not None:
+            self.stages[self.current_stage] = round(time.time() - self.stage_started, 3)
+    
+    def __call__(self, stage: str):
+        self._finish_current()
+        self.current_stage = stage
+        self.stage_started = time.time()
+        redis_service.update_ingest_job(self.job_id, status="processing", stage=stage, stages=self.stages)
+    
+    def finish(self, **fields):
+        self._finish_current()
+        self.current_stage = None
+        redis_service.update_ingest_job(self.job_id, stages=self.stages, **fields)
+
+def process_ingest_request(data):
+    """Process a PDF ingestion request from Redis stream"""
+    job_id = data["job_id"]
+    print(f"Processing ingestion job: {job_id} ({data['original_filename']})")
+    
+    progress = JobProgress(job_id)
+    with NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+        pdf_path = temp_file.name
+    try:
+        # The staged PDF goes straight to disk, where Docling reads it from
+        progress("download")
+        storage.download_staged(data["staged_key"], pdf_path)
+        
+        # Convert the PDF and store the results
+        content, markdown_content, metadata = pdf_processor.process_pdf(
+            pdf_path, data["original_filename"], progress=progress,
+            profile=data.get("options", {}).get("profile")
+        )
+        metadata["content_sha256"] = data["pdf_hash"]
+        
+        document_id = document_store.add_document(metadata, markdown_content)
+        # Cached answers and markdown are keyed by content hash, so a re-ingested PDF
+        # can never be served an earlier version's results and nothing needs invalidating
+        redis_service.set_document_id_for_pdf_hash(data["pdf_hash"], document_id)
+        
+        progress.finish(
+            status="completed",
+            stage="done",
+            document_id=document_id,
+            processing_date=metadata["processing_date"]
+        )
+    except Exception as e:
+        traceback.print_exc()
+        progress.finish(status="failed", error=str(e))
+        print(f"Ingestion job {job_id} failed: {e}")
+        return
+    finally:
+        try:
+            os.unlink(pdf_path)
+        except OSError as e:
+            print(f"Warning: Could not delete temporary file {pdf_path}: {str(e)}")
+    
+    try:
+        storage.delete_staged(data["staged_key"])
+    except Exception as e:
+        print(f"Warning: {e}")
+    
+    print(f"Ingestion job {job_id} processed as document {document_id}")
+    report_timings()
+
+def report_timings():
+    """Publish the cold-start timings, once at startup and again after the first Docling conversion"""
+    global first_conversion_reported
+    if first_conversion_reported:
+        return
+    first_conversion_reported = "first_conversion" in pdf_processor.timings
+    try:
+        redis_service.record_worker_timings(consumer_name, pdf_processor.timings)
+    except Exception as e:
+        print(f"Warning: Could not record worker timings: {e}")
+
+if __name__ == "__main__":
+    startup_started = time.perf_counter()
+    
+    # Initialize Redis service, storage backend and document store
+    redis_service = RedisService()
+    storage = get_storage()
+    storage.startup()
+    document_store = DocumentStore(DocumentManifest(redis_service.redis_client))
+    
+    # Docling models are loaded once per ingestion worker process, before the first job arrives
+    pdf_processor = PDFProcessor()
+    preload_profiles = [profile for profile in os.getenv("PDF_PRELOAD_PROFILES", "").split(",") if profile]
+    pdf_processor.preload(preload_profiles or None)
+    pdf_processor.timings["startup"] = round(time.perf_counter() - startup_started, 3)
+    first_conversion_reported = False
+    
+    # Conversion is CPU-bound, so by default one job runs at a time per process
+    max_in_flight = int(os.getenv("INGEST_MAX_IN_FLIGHT", "1"))
+    
+    # Generate a unique consumer name
+    consumer_name = f"ingest_worker_{os.getpid()}"
+    
+    print(f"Starting ingestion worker with consumer name: {consumer_name} "
+          f"(max in flight: {max_in_flight}, startup timings: {pdf_processor.timings})")
+    report_timings()
+    
+    # Start consuming ingestion requests
+    redis_service.consume_ingest_requests(consumer_name, process_ingest_request, max_in_flight)
@@ -1,9 +1,26 @@
 import os
-from typing import Dict, Any, Tuple, Optional
+import threading
+from typing import Dict, Any, Tuple, Optional, List
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import litellm
-import requests
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
 import time
 import tiktoken
+from .retrieval import BM25Index
+from .vector_index import ChunkVectorIndex
+from .utils import compute_content_hash
+from .http_clients import create_http_session, get_http_pool_size, reset_connect_timing, get_connect_timing
+
+# Bump when summary prompts or the map-reduce strategy change, so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "1"
+
+SUMMARY_FAILED = "Unable to generate summary due to an error."
+ANSWER_FAILED = "Unable to answer question due to an error."
+
+class LLMCallError(Exception):
+    """A model call that failed or returned no usable text"""
 
 class LLMService:
     def __init__(self, api_key: Optional[str] = None):
@@ -38,6 +55,30 @@ class LLMService:
         
         # Initialize tiktoken encoder for token counting
         self.encoder = tiktoken.get_encoding("cl100k_base")
+        
+        # Keep-alive connection pools reused by every call made through this instance
+        pool_size = get_http_pool_size()
+        self.http_session = create_http_session(pool_size)
+        self.gemini_client = HTTPHandler(
+            client=httpx.Client(
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(600.0, connect=10.0)
+            )
+        )
+        
+        # Concurrent chunk calls per summary, and the token budget of one reduce call
+        self.map_concurrency = int(os.getenv("LLM_MAP_CONCURRENCY", "8"))
+        self.reduce_batch_tokens = int(os.getenv("LLM_REDUCE_BATCH_TOKENS", "4000"))
+        
+        # Chunks sent with a long-document question, and per-document keyword indexes (LRU)
+        self.qa_top_k = int(os.getenv("QA_TOP_K", "4"))
+        self.max_cached_indexes = int(os.getenv("QA_INDEX_CACHE_SIZE", "32"))
+        self._chunk_indexes = OrderedDict()
+        self._index_lock = threading.Lock()
+        
+        # Running totals of connection setup cost for HuggingFace calls
+        self.connection_stats = {"calls": 0, "new_connections": 0, "connect_ms": 0.0}
+        self._stats_lock = threading.Lock()
     
     def get_available_models(self) -> list:
         """Return list of available models"""
@@ -59,6 +100,24 @@ class LLMService:
             
         return models
     
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """Return the connection setup totals for HuggingFace calls made so far"""
+        with self._stats_lock:
+            return dict(self.connection_stats)
+    
+    def _record_connect_timing(self):
+        """Log and accumulate the connection setup cost of the call that just finished"""
+        timing = get_connect_timing()
+        with self._stats_lock:
+            self.connection_stats["calls"] += 1
+            self.connection_stats["new_connections"] += timing["new_connections"]
+            self.connection_stats["connect_ms"] += timing["connect_ms"]
+        
+        if timing["new_connections"]:
+            print(f"HuggingFace call opened {timing['new_connections']} connection(s) in {timing['connect_ms']:.1f} ms")
+        else:
+            print("HuggingFace call reused a pooled connection (0.0 ms setup)")
+    
     def _count_tokens(self, text: str) -> int:
         return len(self.encoder.encode(text))
     
@@ -86,16 +145,20 @@ class LLMService:
         
         return chunks
             
-    def generate_summary(self, document_content: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta") -> Tuple[str, Dict[str, Any]]:
+    def generate_summary(self, document_content: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta",
+                         chunk_store=None) -> Tuple[str, Dict[str, Any]]:
         """
         Generate a summary of the document using the specified model.
         
         Args:
             document_content: The text content of the document.
             model_id: The ID of the model to use.
+            chunk_store: Optional store of chunk summaries (get_many/set_many); chunks found
+                there are not sent to the model again.
             
         Returns:
-            Tuple containing the summary and cost information.
+            Tuple containing the summary, cost information and whether generation failed.
+            A failed summary is an error message and must not be cached.
         """
         system_prompt = "You are a helpful assistant that summarizes documents. Provide a concise but comprehensive summary of the document."
         
@@ -103,44 +166,45 @@ class LLMService:
         if self._count_tokens(document_content) > 6000 and model_id.startswith("huggingface"):
             # Chunk the document
             chunks = self._chunk_document(document_content)
-            chunk_summaries = []
-            total_prompt_tokens = 0
-            total_completion_tokens = 0
             
             print(f"Document chunked into {len(chunks)} parts for processing")
             
-            # Process each chunk
-            for i, chunk in enumerate(chunks):
-                chunk_prompt = f"Please summarize the following part {i+1} of {len(chunks)} of the document:\n\n{chunk}"
-                
-                chunk_summary = self._call_huggingface_api(system_prompt, chunk_prompt)
-                chunk_summaries.append(chunk_summary)
-                
-                # Count tokens
-                prompt_tokens = self._count_tokens(system_prompt + chunk_prompt)
-                completion_tokens = self._count_tokens(chunk_summary)
-                total_prompt_tokens += prompt_tokens
-                total_completion_tokens += completion_tokens
-                
-                print(f"Processed chunk {i+1}/{len(chunks)}")
+            # Reuse summaries of chunks seen before, in this or any other document
+            chunk_summaries = chunk_store.get_many(model_id, chunks) if chunk_store else [None] * len(chunks)
+            missing = [i for i, summary in enumerate(chunk_summaries) if summary is None]
+            
+            # Map: summarize the remaining chunks concurrently
+            chunk_prompts = [
+                f"Please summarize the following part {i+1} of {len(chunks)} of the document:\n\n{chunks[i]}"
+                for i in missing
+            ]
+            new_summaries = self._call_huggingface_api_parallel(system_prompt, chunk_prompts) if chunk_prompts else []
+            total_prompt_tokens, total_completion_tokens = self._count_call_tokens(system_prompt, chunk_prompts, new_summaries)
             
-            # Combine chunk summaries
-            combined_summary = "\n\n".join(chunk_summaries)
+            # Only successful calls are stored; a failed chunk is sent again on the next request
+            for i, summary in zip(missing, new_summaries):
+                chunk_summaries[i] = summary
+            if chunk_store:
+                chunk_store.set_many(model_id, {chunks[i]: summary for i, summary in zip(missing, new_summaries) if summary is not None})
             
-            # Generate a final summary of the summaries
-            final_prompt = f"Please create a cohesive final summary from these section summaries:\n\n{combined_summary}"
+            print(f"Processed {len(chunks)} chunks ({len(chunks) - len(missing)} reused from the chunk store)")
             
-            final_summary = self._call_huggingface_api(system_prompt, final_prompt)
+            # A summary stitched from failed chunks would read as a result, so fail the whole request
+            failed_chunks = sum(summary is None for summary in chunk_summaries)
+            if failed_chunks:
+                print(f"{failed_chunks} of {len(chunks)} chunk summaries failed; skipping the reduce")
+                return SUMMARY_FAILED, self._calculate_cost(model_id, total_prompt_tokens, total_completion_tokens), True
             
-            # Add token counts
-            final_prompt_tokens = self._count_tokens(system_prompt + final_prompt)
-            final_completion_tokens = self._count_tokens(final_summary)
-            total_prompt_tokens += final_prompt_tokens
-            total_completion_tokens += final_completion_tokens
+            # Reduce: merge the chunk summaries level by level until one remains
+            final_summary, reduce_prompt_tokens, reduce_completion_tokens = self._reduce_summaries(system_prompt, chunk_summaries)
+            total_prompt_tokens += reduce_prompt_tokens
+            total_completion_tokens += reduce_completion_tokens
             
             cost_info = self._calculate_cost(model_id, total_prompt_tokens, total_completion_tokens)
             
-            return final_summary, cost_info
+            if final_summary is None:
+                return SUMMARY_FAILED, cost_info, True
+            return final_summary, cost_info, False
         else:
             # Original implementation for shorter documents or Gemini
             user_prompt = f"Please summarize the following document:\n\n{document_content}"
@@ -157,86 +221,188 @@ class LLMService:
                 
                 cost_info = self._calculate_cost(model_id, prompt_tokens, completion_tokens)
                 
-                return summary, cost_info
+                return summary, cost_info, False
             except Exception as e:
                 print(f"Error calling LLM API: {str(e)}")
-                return "Unable to generate summary due to an error.", {
-                    "model": model_id,
-                    "input_tokens": 0,
-                    "output_tokens": 0,
-                    "input_cost": 0,
-                    "output_cost": 0,
-                    "total_cost": 0
-                }
+                return SUMMARY_FAILED, self._calculate_cost(model_id, 0, 0), True
+    
+    def _try_huggingface_api(self, system_prompt: str, user_prompt: str) -> Optional[str]:
+        """Call the HuggingFace API, returning None instead of raising when the call fails"""
+        try:
+            return self._call_huggingface_api(system_prompt, user_prompt)
+        except LLMCallError as e:
+            print(f"HuggingFace call failed: {str(e)}")
+            return None
+    
+    def _call_huggingface_api_parallel(self, system_prompt: str, user_prompts: List[str]) -> List[Optional[str]]:
+        """
+        Call the HuggingFace API for several prompts at once, bounded by map_concurrency
+        
+        Args:
+            system_prompt: The system prompt shared by all calls.
+            user_prompts: One user prompt per call.
+            
+        Returns:
+            The responses, in the same order as the prompts; None for a call that failed.
+        """
+        if len(user_prompts) == 1:
+            return [self._try_huggingface_api(system_prompt, user_prompts[0])]
+        
+        max_workers = min(self.map_concurrency, len(user_prompts))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda prompt: self._try_huggingface_api(system_prompt, prompt), user_prompts))
+    
+    def _count_call_tokens(self, system_prompt: str, user_prompts: List[str], responses: List[Optional[str]]) -> Tuple[int, int]:
+        """Count prompt and completion tokens across a batch of calls."""
+        prompt_tokens = sum(self._count_tokens(system_prompt + prompt) for prompt in user_prompts)
+        completion_tokens = sum(self._count_tokens(response) for response in responses if response is not None)
+        return prompt_tokens, completion_tokens
+    
+    def _group_summaries(self, summaries: List[str]) -> List[List[str]]:
+        """
+        Group partial summaries into batches that fit the reduce context budget.
+        Every batch takes at least two summaries so each level shrinks the list.
+        """
+        batches = []
+        current_batch = []
+        current_tokens = 0
+        
+        for summary in summaries:
+            summary_tokens = self._count_tokens(summary)
+            if len(current_batch) >= 2 and current_tokens + summary_tokens > self.reduce_batch_tokens:
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+            current_batch.append(summary)
+            current_tokens += summary_tokens
+        
+        if current_batch:
+            # Fold a trailing single summary into the previous batch rather than carrying it alone
+            if len(current_batch) == 1 and batches:
+                batches[-1].extend(current_batch)
+            else:
+                batches.append(current_batch)
+        
+        return batches
+    
+    def _reduce_summaries(self, system_prompt: str, summaries: List[str]) -> Tuple[Optional[str], int, int]:
+        """
+        Merge partial summaries with a reduce tree: each level combines batches that
+        fit the context concurrently, until a single batch produces the final summary.
+        
+        Returns:
+            Tuple containing the final summary (None if any reduce call failed), prompt
+            tokens and completion tokens.
+        """
+        total_prompt_tokens = 0
+        total_completion_tokens = 0
+        level = 0
+        
+        while True:
+            level += 1
+            batches = self._group_summaries(summaries)
+            reduce_prompts = [
+                "Please create a cohesive final summary from these section summaries:\n\n" + "\n\n".join(batch)
+                for batch in batches
+            ]
+            summaries = self._call_huggingface_api_parallel(system_prompt, reduce_prompts)
+            
+            prompt_tokens, completion_tokens = self._count_call_tokens(system_prompt, reduce_prompts, summaries)
+            total_prompt_tokens += prompt_tokens
+            total_completion_tokens += completion_tokens
+            
+            print(f"Reduce level {level}: merged {len(batches)} batch(es)")
+            
+            if None in summaries:
+                return None, total_prompt_tokens, total_completion_tokens
+            if len(summaries) == 1:
+                return summaries[0], total_prompt_tokens, total_completion_tokens
     
-    def answer_question(self, document_content: str, question: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta") -> Tuple[str, Dict[str, Any]]:
+    def _get_chunk_index(self, document_content: str, chunks: List[str]) -> BM25Index:
+        """Return the keyword index for a document, building it on first use"""
+        content_hash = compute_content_hash(document_content)
+        
+        with self._index_lock:
+            index = self._chunk_indexes.get(content_hash)
+            if index is not None:
+                self._chunk_indexes.move_to_end(content_hash)
+                return index
+        
+        index = BM25Index(chunks)
+        
+        with self._index_lock:
+            self._chunk_indexes[content_hash] = index
+            while len(self._chunk_indexes) > self.max_cached_indexes:
+                self._chunk_indexes.popitem(last=False)
+        
+        return index
+    
+    def _answer_from_chunks(self, system_prompt: str, question: str, model_id: str,
+                            selected: Dict[int, str], chunk_count: int) -> Tuple[str, Dict[str, Any], bool]:
+        """Answer from the selected chunks in one call, keeping them in document order."""
+        print(f"Answering from parts {[i + 1 for i in sorted(selected)]} of {chunk_count}")
+        
+        context = "\n\n".join(f"Document part {i+1} of {chunk_count}:\n\n{selected[i]}" for i in sorted(selected))
+        user_prompt = f"Document: {context}\n\nQuestion: {question}\n\nAnswer:"
+        prompt_tokens = self._count_tokens(system_prompt + user_prompt)
+        
+        answer = self._try_huggingface_api(system_prompt, user_prompt)
+        if answer is None:
+            return ANSWER_FAILED, self._calculate_cost(model_id, prompt_tokens, 0), True
+        
+        completion_tokens = self._count_tokens(answer)
+        cost_info = self._calculate_cost(model_id, prompt_tokens, completion_tokens)
+        
+        return answer, cost_info, False
+    
+    def answer_question(self, document_content: Optional[str], question: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta",
+                        vector_index: Optional[ChunkVectorIndex] = None) -> Tuple[str, Dict[str, Any]]:
         """
         Answer a question about the document provided by the user using the specified model.
         
         Args:
-            document_content: The text content of the document.
+            document_content: The text content of the document. May be None when vector_index is given.
             question: The question to answer.
             model_id: The ID of the model to use.
+            vector_index: Optional dense chunk index of the document, used to pick context.
             
         Returns:
-            Tuple containing the answer and cost information.
+            Tuple containing the answer, cost information and whether answering failed.
+            A failed answer is an error message and must not be cached.
         """
         system_prompt = "You are a helpful assistant that answers questions only restricted to the document content provided. Provide accurate and concise answers based on the document content only."
         
+        if vector_index is not None:
+            token_count = vector_index.token_count
+        else:
+            token_count = self._count_tokens(document_content)
+        
         # Check if document is too long and we're using Zephyr
-        if self._count_tokens(document_content) > 6000 and model_id.startswith("huggingface"):
-            # Chunk the document
-            chunks = self._chunk_document(document_content)
-            chunk_answers = []
-            total_prompt_tokens = 0
-            total_completion_tokens = 0
-            
-            print(f"Document chunked into {len(chunks)} parts for QA processing")
-            
-            # Process each chunk to find potential answers
-            for i, chunk in enumerate(chunks):
-                chunk_prompt = f"Document part {i+1} of {len(chunks)}:\n\n{chunk}\n\nQuestion: {question}\n\nIf you can answer the question based on this document part, provide the answer. If not, respond with 'No relevant information in this part.'"
-                
-                chunk_answer = self._call_huggingface_api(system_prompt, chunk_prompt)
-                
-                # Only keep relevant answers
-                if "No relevant information in this part" not in chunk_answer:
-                    chunk_answers.append(chunk_answer)
-                
-                # Count tokens
-                prompt_tokens = self._count_tokens(system_prompt + chunk_prompt)
-                completion_tokens = self._count_tokens(chunk_answer)
-                total_prompt_tokens += prompt_tokens
-                total_completion_tokens += completion_tokens
+        if token_count > 6000 and model_id.startswith("huggingface"):
+            if vector_index is not None:
+                # Rank the chunks by embedding similarity; only the winners are read from disk
+                start = time.perf_counter()
+                ranked = vector_index.search(question, self.qa_top_k)
+                selected = {chunk_index: vector_index.get_chunk(chunk_index) for chunk_index, _ in ranked}
+                chunk_count = vector_index.chunk_count
+                print(f"Vector search picked {len(selected)} of {chunk_count} parts in {(time.perf_counter() - start) * 1000:.2f} ms")
+            else:
+                # Chunk the document and rank the chunks against the question
+                chunks = self._chunk_document(document_content)
+                index = self._get_chunk_index(document_content, chunks)
+                ranked = index.search(question, self.qa_top_k)
                 
-                print(f"Processed QA chunk {i+1}/{len(chunks)}")
+                # Fall back to the opening chunks if no chunk shares a term with the question
+                chunk_indexes = [chunk_index for chunk_index, _ in ranked] or list(range(min(self.qa_top_k, len(chunks))))
+                selected = {chunk_index: chunks[chunk_index] for chunk_index in chunk_indexes}
+                chunk_count = len(chunks)
             
-            # If we found relevant answers
-            if chunk_answers:
-                # Combine relevant answers
-                combined_answers = "\n\n".join(chunk_answers)
-                
-                # Generate a final consolidated answer
-                final_prompt = f"I found these potential answers to the question '{question}':\n\n{combined_answers}\n\nPlease provide a single coherent answer based on these findings."
-                
-                final_answer = self._call_huggingface_api(system_prompt, final_prompt)
-                
-                # Add token counts
-                final_prompt_tokens = self._count_tokens(system_prompt + final_prompt)
-                final_completion_tokens = self._count_tokens(final_answer)
-                total_prompt_tokens += final_prompt_tokens
-                total_completion_tokens += final_completion_tokens
-                
-                cost_info = self._calculate_cost(model_id, total_prompt_tokens, total_completion_tokens)
-                
-                return final_answer, cost_info
-            else:
-                # No relevant information found in any chunk
-                answer = "I cannot find information about this in the document."
-                cost_info = self._calculate_cost(model_id, total_prompt_tokens, total_completion_tokens)
-                return answer, cost_info
+            return self._answer_from_chunks(system_prompt, question, model_id, selected, chunk_count)
         else:
             # Original implementation for shorter documents or Gemini
+            if document_content is None:
+                document_content = vector_index.full_text()
+            
             user_prompt = f"Document: {document_content}\n\nQuestion: {question}\n\nAnswer:"
             
             try:
@@ -251,20 +417,18 @@ class LLMService:
                 
                 cost_info = self._calculate_cost(model_id, prompt_tokens, completion_tokens)
                 
-                return answer, cost_info
+                return answer, cost_info, False
             except Exception as e:
                 print(f"Error calling LLM API: {str(e)}")
-                return "Unable to answer question due to an error.", {
-                    "model": model_id,
-                    "input_tokens": 0,
-                    "output_tokens": 0,
-                    "input_cost": 0,
-                    "output_cost": 0,
-                    "total_cost": 0
-                }
+                return ANSWER_FAILED, self._calculate_cost(model_id, 0, 0), True
     
     def _call_huggingface_api(self, system_prompt: str, user_prompt: str) -> str:
-        """Call the HuggingFace API with improved prompting."""
+        """
+        Call the HuggingFace API with improved prompting.
+        
+        Raises:
+            LLMCallError: When the call fails or the model returns no text.
+        """
         try:
             # Determine if this is a summary or QA task
             is_summary = "summarize" in user_prompt.lower()
@@ -325,7 +489,9 @@ class LLMService:
                 }
             }
             
-            response = requests.post(api_url, headers=headers, json=payload)
+            reset_connect_timing()
+            response = self.http_session.post(api_url, headers=headers, json=payload)
+            self._record_connect_timing()
             
             if response.status_code == 200:
                 result = response.json()
@@ -337,21 +503,28 @@ class LLMService:
                     elif "Answer:" in generated_text and not is_summary:
                         generated_text = generated_text.split("Answer:")[1].strip()
                     return generated_text
-                return "No valid response from HuggingFace model."
+                raise LLMCallError("No valid response from HuggingFace model.")
             else:
                 # Add retry logic for 503 errors (model loading)
                 if response.status_code == 503:
                     print("Model is loading, retrying in 5 seconds...")
                     time.sleep(5)
                     return self._call_huggingface_api(system_prompt, user_prompt)
-                return f"Error: API returned status code {response.status_code}"
+                raise LLMCallError(f"API returned status code {response.status_code}")
                 
+        except LLMCallError:
+            raise
         except Exception as e:
             print(f"Exception calling HuggingFace API: {str(e)}")
-            return f"Error: {str(e)}"
+            raise LLMCallError(str(e)) from e
         
     def _call_gemini_api(self, system_prompt: str, user_prompt: str) -> str:
-        """Call the Google Gemini API using LiteLLM."""
+        """
+        Call the Google Gemini API using LiteLLM.
+        
+        Raises:
+            LLMCallError: When the call fails or the model returns no text.
+        """
         try:
             # Set the API key as an environment variable
             os.environ['GEMINI_API_KEY'] = self.google_api_key
@@ -374,17 +547,20 @@ class LLMService:
                 model="gemini/gemini-1.5-pro",  # Using the 1.5 version
                 messages=messages,
                 max_tokens=512,
-                temperature=0.7
+                temperature=0.7,
+                client=self.gemini_client
             )
             
             # Extract the generated text if available
             if response and hasattr(response, 'choices') and len(response.choices) > 0:
                 return response.choices[0].message.content
             
-            return "No valid response from Gemini model."
+            raise LLMCallError("No valid response from Gemini model.")
+        except LLMCallError:
+            raise
         except Exception as e:
             print(f"Exception calling Gemini API: {str(e)}")
-            return f"Error: {str(e)}"
+            raise LLMCallError(str(e)) from e
     
     def _calculate_cost(self, model_id: str, input_tokens: int, output_tokens: int) -> Dict[str, Any]:
         """Calculate the cost of the API call based on token usage."""
@@ -1,7 +1,9 @@
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks
+import uuid
+import asyncio
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
 from dotenv import load_dotenv
 from pathlib import Path
@@ -9,16 +11,21 @@ from pathlib import Path
 from .models import (
     Document, DocumentResponse, DocumentListResponse, 
     DocumentContentResponse, SummarizeRequest, SummarizeResponse,
-    QuestionRequest, QuestionResponse, ModelsResponse
+    QuestionRequest, QuestionResponse, ModelsResponse, CacheStatsResponse,
+    UploadResponse, IngestJobResponse, PipelineProfile, DocumentSort, SortOrder
 )
-from .pdf_processor import PDFProcessor
 from .llm_service import LLMService
-from .utils import DocumentStore
-from .redis_service import RedisService
+from .utils import AsyncDocumentStore, compute_content_hash, compute_file_hash
+from .redis_service import AsyncRedisService
+from .result_cache import SummaryCache, QACache
 
 # Load environment variables
 load_dotenv()
 
+# Page size of the document listing
+DOCUMENTS_PAGE_SIZE = int(os.getenv("DOCUMENTS_PAGE_SIZE", "50"))
+MAX_DOCUMENTS_PAGE_SIZE = 500
+
 # Initialize FastAPI app
 app = FastAPI(title="PDF Summarizer API")
 
@@ -31,11 +38,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-pdf_processor = PDFProcessor()
-document_store = DocumentStore()
+# Initialize services (PDF conversion runs in the ingestion workers)
+document_store = AsyncDocumentStore()
 llm_service = LLMService()  # No API key needed for HuggingFace public models
-redis_service = RedisService()
+redis_service = AsyncRedisService()
+summary_cache = SummaryCache(redis_service.redis_client)
+qa_cache = QACache(redis_service.redis_client)
+
+@app.on_event("startup")
+async def startup():
+    # Storage checks (e.g. the S3 bucket) run in the background so startup never waits on them
+    document_store.document_store.storage.startup()
+    # The manifest is loaded, or built from storage on a first deployment, off the request path
+    document_store.document_store.manifest.start_initialize()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await redis_service.close()
 
 @app.get("/")
 async def root():
@@ -48,15 +67,32 @@ async def get_models():
     return {"models": models}
 
 @app.get("/documents", response_model=DocumentListResponse)
-async def get_documents():
-    """Get list of all processed documents"""
-    documents = document_store.get_documents()
-    return {"documents": documents}
+async def get_documents(
+    limit: int = Query(DOCUMENTS_PAGE_SIZE, ge=1, le=MAX_DOCUMENTS_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: DocumentSort = DocumentSort.date,
+    order: SortOrder = SortOrder.desc,
+    name: Optional[str] = Query(None, description="Filename prefix, with sort=name"),
+    date_from: Optional[str] = Query(None, description="Earliest processing date, with sort=date"),
+    date_to: Optional[str] = Query(None, description="Latest processing date, with sort=date")
+):
+    """
+    Get a page of processed documents
+    Follow next_cursor, with the same sort and filters, for the next page
+    """
+    try:
+        documents, next_cursor = await document_store.get_documents_page(
+            limit, cursor, sort=sort.value, order=order.value,
+            name=name, date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"documents": documents, "next_cursor": next_cursor}
 
 @app.get("/documents/{document_id}", response_model=DocumentContentResponse)
 async def get_document(document_id: str):
     """Get content of a specific document"""
-    document_data = document_store.get_document_content(document_id)
+    document_data = await document_store.get_document_content(document_id)
     if not document_data:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -68,48 +104,90 @@ async def get_document(document_id: str):
         "metadata": document_data["metadata"]
     }
 
-@app.post("/upload_pdf")
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and process a PDF file"""
+@app.post("/upload_pdf", response_model=UploadResponse)
+async def upload_pdf(file: UploadFile = File(...),
+                     profile: Optional[PipelineProfile] = Form(None)):
+    """Upload a PDF file and queue it for ingestion, optionally with a named pipeline profile"""
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
-    # Read file content
-    file_content = await file.read()
+    # The upload is already spooled by the server; hash and stage it in chunks instead of reading it into memory
+    upload_chunk_size = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
     
-    # Process PDF
-    content, markdown_content, metadata = pdf_processor.process_pdf(file_content, file.filename)
+    # Identical bytes were converted before: return that document instead of running Docling again,
+    # unless a profile was asked for that the earlier conversion did not use
+    pdf_hash = await asyncio.to_thread(compute_file_hash, file.file, upload_chunk_size)
+    existing_id = await redis_service.get_document_id_by_pdf_hash(pdf_hash)
+    if existing_id:
+        existing = await document_store.get_document_metadata(existing_id)
+        if not existing:
+            # The document was removed from storage; process the upload again
+            await redis_service.remove_pdf_hash(pdf_hash)
+        elif profile is None or existing.get("pipeline_profile") == profile.value:
+            return {
+                "status": "completed",
+                "document_id": existing_id,
+                "original_filename": existing["original_filename"],
+                "processing_date": existing["processing_date"],
+                "deduplicated": True
+            }
     
-    # Add document to store
-    document_id = document_store.add_document(metadata, markdown_content)
+    # Stage the PDF for the ingestion workers and return the job straight away
+    job_id = str(uuid.uuid4())
+    staged_key = await document_store.stage_upload(file.file, job_id, file.filename)
+    options = {"profile": profile.value} if profile else {}
+    job = await redis_service.create_ingest_job(job_id, staged_key, file.filename, pdf_hash, options=options)
     
     return {
-        "document_id": document_id,
-        "original_filename": metadata["original_filename"],
-        "processing_date": metadata["processing_date"]
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "original_filename": job["original_filename"]
     }
 
+@app.get("/ingest_jobs/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str):
+    """Get the status and per-stage progress of an ingestion job"""
+    job = await redis_service.get_ingest_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
 @app.post("/summarize", response_model=SummarizeResponse)
 async def summarize(request: SummarizeRequest):
     """Generate a summary for a document using Redis streams"""
     # Get document
-    document_data = document_store.get_document_content(request.document_id)
+    document_data = await document_store.get_document_content(request.document_id)
     if not document_data:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    # Answer repeat requests for the same content and model straight from the cache
+    content_hash = compute_content_hash(document_data["content"])
+    cached = await summary_cache.get(content_hash, request.model_id)
+    if cached:
+        return {
+            "summary": cached["summary"],
+            "cost": cached["cost"],
+            "cached": True
+        }
+    
+    # Share the content once under its hash; the stream entry only carries the reference
+    await redis_service.cache_document_content(content_hash, document_data["content"])
+    
     # Publish summary request to Redis stream
-    request_id = redis_service.publish_summary_request(
+    request_id = await redis_service.publish_summary_request(
         request.document_id, 
-        document_data["content"],
+        content_hash,
         request.model_id
     )
     
     # Wait for response from the worker
-    response = redis_service.get_summary_response(request_id)
+    response = await redis_service.get_summary_response(request_id)
     
     if not response:
         raise HTTPException(status_code=504, detail="Summary generation timed out")
     
+    await summary_cache.set(content_hash, request.model_id, response)
+    
     return {
         "summary": response["summary"],
         "cost": response["cost"]
@@ -119,29 +197,53 @@ async def summarize(request: SummarizeRequest):
 async def ask_question(request: QuestionRequest):
     """Answer a question about a document using Redis streams"""
     # Get document
-    document_data = document_store.get_document_content(request.document_id)
+    document_data = await document_store.get_document_content(request.document_id)
     if not document_data:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    # Answer repeated or reworded questions straight from the cache
+    content_hash = compute_content_hash(document_data["content"])
+    cached = await qa_cache.get(content_hash, request.model_id, request.question)
+    if cached:
+        return {
+            "answer": cached["answer"],
+            "cost": cached["cost"],
+            "cached": True
+        }
+    
+    # Share the content once under its hash; the stream entry only carries the reference
+    await redis_service.cache_document_content(content_hash, document_data["content"])
+    
     # Publish QA request to Redis stream
-    request_id = redis_service.publish_qa_request(
+    request_id = await redis_service.publish_qa_request(
         request.document_id,
-        document_data["content"],
+        content_hash,
         request.question,
         request.model_id
     )
     
     # Wait for response from the worker
-    response = redis_service.get_qa_response(request_id)
+    response = await redis_service.get_qa_response(request_id)
     
     if not response:
         raise HTTPException(status_code=504, detail="Question answering timed out")
     
+    await qa_cache.set(content_hash, request.model_id, request.question, response)
+    
     return {
         "answer": response["answer"],
         "cost": response["cost"]
     }
 
+@app.get("/cache_stats", response_model=CacheStatsResponse)
+async def get_cache_stats():
+    """Get hit/miss counters of the result caches and this replica's document content cache"""
+    return {
+        "summary": await summary_cache.get_stats(),
+        "qa": await qa_cache.get_stats(),
+        "content": document_store.document_store.content_cache.get_stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,439 @@
+import os
+import json
+import base64
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+import redis
+from dotenv import load_dotenv
+
+from .storage import StorageBackend, get_storage
+
+# Load environment variables
+load_dotenv()
+
+# Fields of the ingestion metadata that listing and lookups need
+MANIFEST_FIELDS = (
+    "document_id", "original_filename", "processing_date", "pdf_url", "markdown_url",
+    "content_sha256", "markdown_sha256", "processor", "pipeline_profile"
+)
+
+# Seconds the publish lock outlives a publisher that stopped renewing it
+PUBLISH_LOCK_TIMEOUT = 60
+# Seconds add() and remove() wait before publishing, so a burst of ingests shares one upload
+PUBLISH_DELAY = float(os.getenv("MANIFEST_PUBLISH_DELAY", "2"))
+
+# Orderings a page of the listing can follow; each has a lexicographic index in Redis
+SORT_FIELDS = ("date", "name")
+# Index members are "<sort value>\x00<document ID>", so equal values still order uniquely
+MEMBER_SEPARATOR = "\x00"
+# Sorts after every member sharing a prefix, for prefix and end-of-day range bounds
+RANGE_END = chr(0x10FFFF)
+
+
+class DocumentManifest:
+    """
+    Listing of every ingested document: a Redis hash of document ID to JSON entry,
+    mirrored to a JSON manifest object in storage so it survives a Redis flush
+
+    Ingestion adds entries as documents are stored, so listing is one HGETALL instead
+    of a storage listing plus two requests per document. reconcile() repairs drift
+    between the manifest and what is actually stored. Every change bumps a version
+    counter, and publish() uploads under a lock until the stored copy has caught up
+    with it, so concurrent ingests never overwrite each other's entries. add() and
+    remove() publish from a short-delayed background timer rather than inline.
+
+    Two sorted sets beside the hash index the entries by processing date and by
+    lower-cased filename, so page() reads one page of the listing with a range query
+    and an HMGET however many documents there are.
+
+    A marker key records that the hash has been loaded, so an empty hash with the
+    marker set is an empty corpus. Storage is only reconciled by initialize() at
+    startup and by the reconciliation job, never while serving a listing.
+    """
+
+    def __init__(self, redis_client=None, storage: Optional[StorageBackend] = None,
+                 manifest_key: Optional[str] = None, publish_delay: Optional[float] = None):
+        """
+        Args:
+            redis_client: Synchronous Redis client; one is created from REDIS_HOST / REDIS_PORT if not given
+            storage: Storage backend holding the documents and the manifest object; get_storage() by default
+            manifest_key: Redis key of the manifest hash, prefix of its other keys; DOCUMENT_MANIFEST_KEY by default
+            publish_delay: Seconds add() and remove() wait before publishing; PUBLISH_DELAY by default,
+                0 publishes inline
+        """
+        self.storage = storage or get_storage()
+        self.redis_client = redis_client or redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            decode_responses=True
+        )
+        self.manifest_key = manifest_key or os.getenv("DOCUMENT_MANIFEST_KEY", "document_manifest")
+        self.index_keys = {sort: f"{self.manifest_key}:by_{sort}" for sort in SORT_FIELDS}
+        self.version_key = f"{self.manifest_key}:version"
+        self.publish_lock_key = f"{self.manifest_key}:publish_lock"
+        self.published_version_key = f"{self.manifest_key}:published_version"
+        self.loaded_key = f"{self.manifest_key}:loaded"
+        self.publish_delay = PUBLISH_DELAY if publish_delay is None else publish_delay
+        self._publish_timer = None
+        self._publish_timer_lock = threading.Lock()
+
+    @staticmethod
+    def entry_from_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a manifest entry from ingestion metadata, with the processing date in listing format"""
+        entry = {field: metadata[field] for field in MANIFEST_FIELDS if metadata.get(field) is not None}
+        try:
+            processed = datetime.strptime(entry["processing_date"], "%Y%m%d_%H%M%S")
+            entry["processing_date"] = processed.strftime("%Y-%m-%d %H:%M:%S")
+        except (KeyError, ValueError):
+            pass
+        return entry
+
+    def _index_members(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """The member an entry has in each sort index"""
+        values = {
+            "date": entry.get("processing_date", ""),
+            "name": entry.get("original_filename", "").lower()
+        }
+        return {
+            self.index_keys[sort]: f"{values[sort]}{MEMBER_SEPARATOR}{entry['document_id']}"
+            for sort in SORT_FIELDS
+        }
+
+    def _index(self, pipeline, entries: List[Dict[str, Any]]):
+        members = {key: {} for key in self.index_keys.values()}
+        for entry in entries:
+            for key, member in self._index_members(entry).items():
+                members[key][member] = 0
+        for key, mapping in members.items():
+            if mapping:
+                pipeline.zadd(key, mapping)
+
+    def _unindex(self, pipeline, entries: List[Dict[str, Any]]):
+        for entry in entries:
+            for key, member in self._index_members(entry).items():
+                pipeline.zrem(key, member)
+
+    def add(self, entry: Dict[str, Any]):
+        """Add or replace a document's entry and schedule a rewrite of the stored manifest"""
+        self._ensure_loaded()
+        previous = self.get(entry["document_id"])
+        pipeline = self.redis_client.pipeline()
+        if previous:
+            self._unindex(pipeline, [previous])
+        pipeline.hset(self.manifest_key, entry["document_id"], json.dumps(entry))
+        self._index(pipeline, [entry])
+        pipeline.incr(self.version_key)
+        pipeline.execute()
+        self.schedule_publish()
+
+    def remove(self, document_id: str):
+        """Drop a document from the manifest"""
+        self._ensure_loaded()
+        previous = self.get(document_id)
+        pipeline = self.redis_client.pipeline()
+        if previous:
+            self._unindex(pipeline, [previous])
+        pipeline.hdel(self.manifest_key, document_id)
+        pipeline.incr(self.version_key)
+        pipeline.execute()
+        self.schedule_publish()
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        entry = self.redis_client.hget(self.manifest_key, document_id)
+        return json.loads(entry) if entry else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """All manifest entries in one read, newest first"""
+        self._ensure_loaded()
+        documents = [json.loads(entry) for entry in self.redis_client.hgetall(self.manifest_key).values()]
+        return sorted(documents, key=lambda entry: entry.get("processing_date", ""), reverse=True)
+
+    def page(self, limit: int, cursor: Optional[str] = None, sort: str = "date", order: str = "desc",
+             name: Optional[str] = None, date_from: Optional[str] = None,
+             date_to: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of the listing
+
+        Args:
+            limit: Maximum number of entries on the page
+            cursor: next_cursor of the previous page; None for the first page
+            sort: "date" (processing date) or "name" (filename, case-insensitive)
+            order: "asc" or "desc"
+            name: Only filenames starting with this prefix; needs sort="name"
+            date_from: Only documents processed on or after this date ("YYYY-MM-DD[ HH:MM:SS]"); needs sort="date"
+            date_to: Only documents processed on or before this date; needs sort="date"
+
+        Returns:
+            The entries and the cursor of the next page, or None after the last page
+
+        Raises:
+            ValueError: For an unknown sort or order, a filter on the other sort field,
+                or a cursor issued for a different query
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unknown order: {order}")
+        if name and sort != "name":
+            raise ValueError("Filtering by name needs sort=name")
+        if (date_from or date_to) and sort != "date":
+            raise ValueError("Filtering by date needs sort=date")
+
+        # The cursor carries its query so it cannot be replayed against another one
+        query = {"s": sort, "o": order, "n": name, "f": date_from, "t": date_to}
+        after = self._decode_cursor(cursor, query) if cursor else None
+
+        # Lexicographic range of the filter, in Redis ZRANGEBYLEX syntax
+        if name:
+            low, high = f"[{name.lower()}", f"({name.lower()}{RANGE_END}"
+        else:
+            low = f"[{date_from}" if date_from else "-"
+            high = f"[{date_to}{RANGE_END}" if date_to else "+"
+        if after is not None:
+            if order == "asc":
+                low = f"({after}"
+            else:
+                high = f"({after}"
+
+        self._ensure_loaded()
+        key = self.index_keys[sort]
+        # One extra member tells whether another page follows
+        if order == "asc":
+            members = self.redis_client.zrangebylex(key, low, high, start=0, num=limit + 1)
+        else:
+            members = self.redis_client.zrevrangebylex(key, high, low, start=0, num=limit + 1)
+
+        page_members = members[:limit]
+        next_cursor = None
+        if len(members) > limit and page_members:
+            next_cursor = self._encode_cursor(page_members[-1], query)
+
+        if not page_members:
+            return [], next_cursor
+        document_ids = [member.rsplit(MEMBER_SEPARATOR, 1)[1] for member in page_members]
+        entries = self.redis_client.hmget(self.manifest_key, document_ids)
+        return [json.loads(entry) for entry in entries if entry], next_cursor
+
+    @staticmethod
+    def _encode_cursor(member: str, query: Dict[str, Any]) -> str:
+        payload = json.dumps({**query, "m": member}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, query: Dict[str, Any]) -> str:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            member = payload.pop("m")
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if payload != query or not isinstance(member, str):
+            raise ValueError("Cursor does not belong to this query")
+        return member
+
+    def _ensure_loaded(self):
+        """
+        Restore the hash from the stored manifest when Redis has lost it, and build the
+        sort indexes when they are missing
+
+        This is the request path: at most one read of the stored manifest, never a
+        storage listing.
+        """
+        pipeline = self.redis_client.pipeline()
+        pipeline.exists(self.loaded_key)
+        pipeline.hlen(self.manifest_key)
+        pipeline.zcard(self.index_keys["date"])
+        loaded, entry_count, indexed_count = pipeline.execute()
+        if not loaded and self._restore():
+            return
+        if indexed_count != entry_count:
+            self.rebuild_indexes()
+
+    def initialize(self):
+        """
+        Load the manifest into Redis unless it already is: from the stored manifest, or
+        on a first deployment, which has none, by reconciling with storage
+        """
+        if self.redis_client.exists(self.loaded_key):
+            return
+        if not self._restore():
+            self.reconcile()
+
+    def start_initialize(self):
+        """Run initialize() in a background thread so startup does not wait for it"""
+        def run():
+            try:
+                self.initialize()
+            except Exception as e:
+                print(f"Warning: Could not initialize the document manifest: {e}")
+        threading.Thread(target=run, name="manifest-initialize", daemon=True).start()
+
+    def rebuild_indexes(self):
+        """Recreate the sort indexes from the manifest hash"""
+        entries = [json.loads(entry) for entry in self.redis_client.hgetall(self.manifest_key).values()]
+        pipeline = self.redis_client.pipeline()
+        pipeline.delete(*self.index_keys.values())
+        self._index(pipeline, entries)
+        pipeline.execute()
+
+    def _version(self) -> int:
+        return int(self.redis_client.get(self.version_key) or 0)
+
+    def schedule_publish(self):
+        """
+        Publish after publish_delay in a background thread
+        Changes made before the timer fires share its upload
+        """
+        if self.publish_delay <= 0:
+            self.publish()
+            return
+        with self._publish_timer_lock:
+            if self._publish_timer is not None:
+                return
+            self._publish_timer = threading.Timer(self.publish_delay, self._run_scheduled_publish)
+            self._publish_timer.name = "manifest-publish"
+            self._publish_timer.start()
+
+    def _run_scheduled_publish(self):
+        with self._publish_timer_lock:
+            self._publish_timer = None
+        try:
+            self.publish()
+        except Exception as e:
+            print(f"Warning: Could not publish the document manifest: {e}")
+
+    def _renew_lock(self, lock, stop: threading.Event):
+        """Keep the publish lock alive while its holder uploads, however slow the upload is"""
+        while not stop.wait(PUBLISH_LOCK_TIMEOUT / 3):
+            try:
+                lock.reacquire()
+            except redis.exceptions.LockError:
+                return
+
+    def publish(self):
+        """
+        Write the current Redis manifest to storage
+
+        One process publishes at a time. A writer that finds the lock taken returns at
+        once, because the holder checks the version again after releasing it and
+        publishes once more if anything changed while it was uploading. The holder
+        renews the lock while it uploads, and only writes a snapshot newer than the last
+        one published, checked under the lock, so an older snapshot never replaces a
+        newer one. Nothing is published before the hash is loaded, when it would
+        overwrite the stored copy with a partial one.
+        """
+        while True:
+            if not self.redis_client.exists(self.loaded_key):
+                return
+            # Not thread-local, so the renewal thread can extend it
+            lock = self.redis_client.lock(self.publish_lock_key, timeout=PUBLISH_LOCK_TIMEOUT, thread_local=False)
+            if not lock.acquire(blocking=False):
+                return
+            stop_renewal = threading.Event()
+            threading.Thread(
+                target=self._renew_lock, args=(lock, stop_renewal), name="manifest-publish-lock", daemon=True
+            ).start()
+            try:
+                # Read the version first, so the snapshot holds at least every change it counts
+                version = self._version()
+                if version > int(self.redis_client.get(self.published_version_key) or 0):
+                    entries = self.redis_client.hgetall(self.manifest_key)
+                    documents = sorted(
+                        (json.loads(entry) for entry in entries.values()), key=lambda entry: entry["document_id"]
+                    )
+                    payload = json.dumps(documents).encode("utf-8")
+                    # A holder that lost the lock may be behind whoever took it over
+                    if not lock.owned():
+                        return
+                    self.storage.upload_manifest(payload)
+                    self.redis_client.set(self.published_version_key, version)
+            finally:
+                stop_renewal.set()
+                try:
+                    lock.release()
+                except redis.exceptions.LockError:
+                    # Lost despite the renewal; the version check below still catches missed changes
+                    pass
+            if self._version() == version:
+                return
+
+    def _restore(self) -> bool:
+        """
+        Load the stored manifest into Redis and mark the hash loaded
+        Returns False, changing nothing, when there is no stored manifest yet
+        """
+        manifest_content = self.storage.get_manifest()
+        if manifest_content is None:
+            return False
+
+        # Entries written by older versions may predate the listing date format. Entries
+        # already in Redis, e.g. from an ingest since the flush, are newer and kept
+        documents = [self.entry_from_metadata(entry) for entry in json.loads(manifest_content)]
+        present = set(self.redis_client.hkeys(self.manifest_key))
+        missing = {
+            entry["document_id"]: json.dumps(entry) for entry in documents if entry["document_id"] not in present
+        }
+        if missing:
+            self.redis_client.hset(self.manifest_key, mapping=missing)
+        self.rebuild_indexes()
+        self.redis_client.set(self.loaded_key, 1)
+        return True
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        Bring the manifest in line with the documents in storage
+
+        Documents missing from the manifest are added from their stored metadata and
+        entries whose PDF no longer exists are dropped.
+
+        Returns:
+            Counts of added, removed and unchanged entries
+        """
+        manifest_ids = set(self.redis_client.hkeys(self.manifest_key))
+        stored_ids = set()
+
+        # Storage is listed a page at a time and each page's missing documents are
+        # looked up concurrently, rather than one request pair at a time
+        added = {}
+        for document_ids in self.storage.iter_documents():
+            stored_ids.update(document_ids)
+            missing = self.storage.get_documents_metadata([
+                document_id for document_id in document_ids if document_id not in manifest_ids
+            ])
+            for document_id, metadata in missing.items():
+                if isinstance(metadata, Exception):
+                    print(f"Warning: Could not get metadata of {document_id}: {metadata}")
+                elif metadata:
+                    added[document_id] = self.entry_from_metadata(metadata)
+        removed = list(manifest_ids - stored_ids)
+        removed_entries = [
+            json.loads(entry) for entry in self.redis_client.hmget(self.manifest_key, removed) if entry
+        ] if removed else []
+
+        pipeline = self.redis_client.pipeline()
+        if added:
+            pipeline.hset(
+                self.manifest_key,
+                mapping={document_id: json.dumps(metadata) for document_id, metadata in added.items()}
+            )
+            self._index(pipeline, list(added.values()))
+        if removed:
+            self._unindex(pipeline, removed_entries)
+            pipeline.hdel(self.manifest_key, *removed)
+        pipeline.incr(self.version_key)
+        pipeline.set(self.loaded_key, 1)
+        pipeline.execute()
+        self.publish()
+
+        return {
+            "added": len(added),
+            "removed": len(removed),
+            "unchanged": len(stored_ids & manifest_ids)
+        }
+
+
+if __name__ == "__main__":
+    # Reconciliation job: python -m app.backend.manifest
+    result = DocumentManifest().reconcile()
+    print(f"Manifest reconciled: {result}")
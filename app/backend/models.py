@@ -1,8 +1,24 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from enum import Enum
 import uuid
 
+class PipelineProfile(str, Enum):
+    """Named PDF conversion profiles, trading ingestion time against extraction quality"""
+    fast = "fast"
+    balanced = "balanced"
+    accurate = "accurate"
+
+class DocumentSort(str, Enum):
+    """Orderings of the document listing"""
+    date = "date"
+    name = "name"
+
+class SortOrder(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
 class Document(BaseModel):
     document_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     original_filename: str
@@ -18,6 +34,7 @@ class DocumentResponse(BaseModel):
 
 class DocumentListResponse(BaseModel):
     documents: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
 
 class DocumentContentResponse(BaseModel):
     document_id: str
@@ -26,6 +43,26 @@ class DocumentContentResponse(BaseModel):
     markdown_content: str
     metadata: Optional[Dict[str, Any]] = None
 
+class UploadResponse(BaseModel):
+    job_id: Optional[str] = None
+    status: str
+    original_filename: str
+    document_id: Optional[str] = None
+    processing_date: Optional[str] = None
+    deduplicated: bool = False
+
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: str
+    original_filename: str
+    document_id: Optional[str] = None
+    processing_date: Optional[str] = None
+    error: Optional[str] = None
+    stages: Dict[str, float] = {}
+    created_at: float
+    updated_at: float
+
 class SummarizeRequest(BaseModel):
     document_id: str
     model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta"
@@ -33,6 +70,7 @@ class SummarizeRequest(BaseModel):
 class SummarizeResponse(BaseModel):
     summary: str
     cost: Dict[str, Any]
+    cached: bool = False
 
 class QuestionRequest(BaseModel):
     document_id: str
@@ -42,6 +80,7 @@ class QuestionRequest(BaseModel):
 class QuestionResponse(BaseModel):
     answer: str
     cost: Dict[str, Any]
+    cached: bool = False
 
 class ModelInfo(BaseModel):
     id: str
@@ -49,4 +88,25 @@ class ModelInfo(BaseModel):
     provider: str
 
 class ModelsResponse(BaseModel):
-    models: List[ModelInfo] 
\ No newline at end of file
+    models: List[ModelInfo]
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+
+class QACacheStats(CacheStats):
+    similar_hits: int
+
+class ContentCacheStats(BaseModel):
+    memory_hits: int
+    disk_hits: int
+    revalidations: int
+    misses: int
+    entries: int
+    memory_bytes: int
+
+class CacheStatsResponse(BaseModel):
+    summary: CacheStats
+    qa: QACacheStats
+    content: ContentCacheStats 
\ No newline at end of file
@@ -1,187 +1,551 @@
 import os
 import io
+import math
+import hashlib
+import time
+import queue
+from contextlib import contextmanager
+import multiprocessing
 from pathlib import Path
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Optional, Callable, List
 from datetime import datetime
-import tempfile
 from tempfile import NamedTemporaryFile
-from .s3_utils import upload_pdf_to_s3, upload_markdown_to_s3, upload_file_to_s3
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from .storage import StorageBackend, get_storage
+from .models import PipelineProfile
+from .text_extractor import scan_pdf, assess_pdf, extract_markdown
 
 # Docling imports
+import pypdfium2 as pdfium
 from docling.document_converter import DocumentConverter
-from docling.datamodel.base_models import InputFormat, DocumentStream
+from docling.datamodel.base_models import InputFormat
 from docling_core.types.doc import ImageRefMode, PictureItem
 from docling.document_converter import PdfFormatOption
-from docling.datamodel.pipeline_options import PdfPipelineOptions
+from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode
+
+IMAGE_PLACEHOLDER = "<!-- image -->"
+
+# Pipeline settings per profile. "fast_path" lets simple born-digital PDFs skip Docling,
+# "auto" OCR runs the OCR model only on pages without a text layer, and "auto" table
+# structure runs TableFormer only on pages the text-layer scan flags as holding a table
+PIPELINE_PROFILES = {
+    PipelineProfile.fast: {
+        "fast_path": True,
+        "ocr": "auto",
+        "table_structure": "auto",
+        "table_mode": TableFormerMode.FAST,
+        "images_scale": 1.0
+    },
+    PipelineProfile.balanced: {
+        "fast_path": True,
+        "ocr": "auto",
+        "table_structure": True,
+        "table_mode": TableFormerMode.FAST,
+        "images_scale": 2.0
+    },
+    PipelineProfile.accurate: {
+        "fast_path": False,
+        "ocr": "always",
+        "table_structure": True,
+        "table_mode": TableFormerMode.ACCURATE,
+        "images_scale": 2.0
+    }
+}
+
+DEFAULT_PIPELINE_PROFILE = PipelineProfile(os.getenv("PDF_PIPELINE_PROFILE", PipelineProfile.balanced.value))
+
+def _table_variants(profile: PipelineProfile) -> List[bool]:
+    """The table-structure settings a profile's converters can have"""
+    setting = PIPELINE_PROFILES[profile]["table_structure"]
+    return [False, True] if setting == "auto" else [setting]
+
+def build_converter(profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE, ocr: bool = True,
+                    tables: Optional[bool] = None) -> DocumentConverter:
+    """
+    Create a Docling converter with the PDF pipeline options of a profile
+    
+    Args:
+        profile: The pipeline profile
+        ocr: Whether the converter runs OCR; only used for pages without a text layer
+        tables: Whether the converter runs table structure; for profiles where it is
+            "auto", only used for pages with a table. Defaults to the profile's setting
+    """
+    settings = PIPELINE_PROFILES[profile]
+    if tables is None:
+        tables = settings["table_structure"] is not False
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.do_ocr = ocr
+    pipeline_options.do_table_structure = tables
+    pipeline_options.table_structure_options.mode = settings["table_mode"]
+    pipeline_options.images_scale = settings["images_scale"]
+    pipeline_options.generate_page_images = False  # Set to True if you want page images
+    pipeline_options.generate_picture_images = False  # Set to True if you want picture images
+    
+    return DocumentConverter(
+        allowed_formats=[InputFormat.PDF],
+        format_options={
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=pipeline_options,
+            ),
+        }
+    )
+
+def _page_runs(needs_ocr: List[bool], needs_tables: List[bool]) -> List[Tuple[int, int, bool, bool]]:
+    """Group consecutive pages with the same OCR and table-structure needs into (start, end, ocr, tables) ranges"""
+    runs = []
+    for index, needs in enumerate(zip(needs_ocr, needs_tables)):
+        if runs and runs[-1][2:] == needs:
+            runs[-1] = (runs[-1][0], index + 1, *needs)
+        else:
+            runs.append((index, index + 1, *needs))
+    return runs
+
+def _convert_range(converter: DocumentConverter, pdf_path: str, start: int, end: int) -> Dict[str, Any]:
+    """
+    Convert pages [start, end) of a PDF with the given converter
+    
+    Returns:
+        The extracted conversion (see PDFProcessor._extract_conversion), which pickles cleanly
+    """
+    source = pdfium.PdfDocument(pdf_path)
+    part = pdfium.PdfDocument.new()
+    try:
+        part.import_pages(source, list(range(start, end)))
+        with NamedTemporaryFile(suffix=".pdf", delete=False) as part_file:
+            part_path = part_file.name
+        part.save(part_path)
+    finally:
+        part.close()
+        source.close()
+    
+    try:
+        conv_result = converter.convert(part_path)
+        return PDFProcessor._extract_conversion(conv_result.document)
+    finally:
+        os.unlink(part_path)
+
+# Converters owned by a page-conversion worker process, keyed by (profile, ocr, tables)
+_worker_converters = {}
+
+def _get_worker_converter(profile: PipelineProfile, ocr: bool, tables: bool) -> DocumentConverter:
+    converter = _worker_converters.get((profile, ocr, tables))
+    if converter is None:
+        converter = build_converter(profile, ocr, tables)
+        converter.initialize_pipeline(InputFormat.PDF)
+        _worker_converters[(profile, ocr, tables)] = converter
+    return converter
+
+def _init_page_worker():
+    """Process pool initializer: build the default converters and load their models up front"""
+    for tables in _table_variants(DEFAULT_PIPELINE_PROFILE):
+        _get_worker_converter(DEFAULT_PIPELINE_PROFILE, False, tables)
+        _get_worker_converter(DEFAULT_PIPELINE_PROFILE, True, tables)
+
+def _page_worker_ready(_: int) -> int:
+    """No-op task; mapping it over the pool waits until every worker has run its initializer"""
+    return os.getpid()
+
+def _convert_page_range(pdf_path: str, start: int, end: int,
+                        profile: PipelineProfile = DEFAULT_PIPELINE_PROFILE, ocr: bool = True,
+                        tables: bool = True) -> Dict[str, Any]:
+    """Convert pages [start, end) of a PDF in a worker process"""
+    return _convert_range(_get_worker_converter(profile, ocr, tables), pdf_path, start, end)
+
+class ConverterPool:
+    """
+    Docling converters per (profile, ocr, tables), each key holding `size` instances
+    
+    A job checks a converter out for the length of a conversion, so concurrent jobs
+    never share one. Converters are built on first use unless preloaded.
+    """
+    
+    def __init__(self, size: int = 1):
+        self.size = size
+        self._pools = {}
+        self._lock = Lock()
+    
+    def _pool(self, profile: PipelineProfile, ocr: bool, tables: bool) -> queue.Queue:
+        with self._lock:
+            pool = self._pools.get((profile, ocr, tables))
+            if pool is None:
+                pool = queue.Queue()
+                for _ in range(self.size):
+                    pool.put(None)
+                self._pools[(profile, ocr, tables)] = pool
+            return pool
+    
+    def preload(self, profile: PipelineProfile, ocr: bool, tables: bool):
+        """Build every converter for a key and load its models now rather than on the first conversion"""
+        pool = self._pool(profile, ocr, tables)
+        converters = [pool.get() for _ in range(self.size)]
+        try:
+            for index, converter in enumerate(converters):
+                if converter is None:
+                    converter = build_converter(profile, ocr, tables)
+                    converter.initialize_pipeline(InputFormat.PDF)
+                    converters[index] = converter
+        finally:
+            for converter in converters:
+                pool.put(converter)
+    
+    @contextmanager
+    def converter(self, profile: PipelineProfile, ocr: bool, tables: bool):
+        pool = self._pool(profile, ocr, tables)
+        converter = pool.get()
+        try:
+            if converter is None:
+                converter = build_converter(profile, ocr, tables)
+            yield converter
+        finally:
+            pool.put(converter)
 
 class PDFProcessor:
-    def __init__(self):
+    def __init__(self, storage: Optional[StorageBackend] = None):
         """
         Initialize the PDF processor with Docling configuration
+        
+        Args:
+            storage: Where the PDF, markdown and images are stored; get_storage() by default
         """
-        # Initialize Docling document converter with appropriate options
-        pipeline_options = PdfPipelineOptions()
-        pipeline_options.do_ocr = True
-        pipeline_options.do_table_structure = True
-        pipeline_options.images_scale = 2.0
-        pipeline_options.generate_page_images = False  # Set to True if you want page images
-        pipeline_options.generate_picture_images = False  # Set to True if you want picture images
-        
-        self.doc_converter = DocumentConverter(
-            allowed_formats=[InputFormat.PDF],
-            format_options={
-                InputFormat.PDF: PdfFormatOption(
-                    pipeline_options=pipeline_options,
-                ),
-            }
+        init_started = time.perf_counter()
+        self.storage = storage or get_storage()
+        
+        # Docling converters per (profile, ocr, tables); one per job that may convert at the same time
+        self.converter_pool = ConverterPool(
+            int(os.getenv("PDF_CONVERTER_POOL_SIZE", os.getenv("INGEST_MAX_IN_FLIGHT", "1")))
         )
+        
+        # Cold-start cost: construction, model preloading and the first Docling conversion, in seconds
+        self.timings = {}
+        
+        # Large PDFs can be split into page ranges converted across a process pool
+        self.parallel_workers = int(os.getenv("PDF_PARALLEL_WORKERS", "0"))
+        self.parallel_min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+        self.pages_per_part = int(os.getenv("PDF_PAGES_PER_PART", "10"))
+        self.page_pool = None
+        if self.parallel_workers > 1:
+            # Spawn rather than fork: forking after torch has started its threads can deadlock
+            self.page_pool = ProcessPoolExecutor(
+                max_workers=self.parallel_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_page_worker
+            )
+        
+        # Simple born-digital PDFs can be extracted without Docling
+        self.fast_path_enabled = os.getenv("PDF_FAST_PATH", "true").lower() == "true"
+        
+        self.timings["init"] = round(time.perf_counter() - init_started, 3)
         print("Docling initialized successfully")
     
-    def process_pdf(self, file_content: bytes, original_filename: str) -> Tuple[str, str, Dict[str, Any]]:
+    def preload(self, profiles: Optional[List[PipelineProfile]] = None) -> Dict[str, float]:
         """
-        Process a PDF file using Docling and extract its text content, storing in S3
+        Load the Docling models for the given profiles, with and without OCR and table structure, before the first job
+        
+        The page-conversion processes, when configured, are started and warmed as well.
         
         Args:
-            file_content: The binary content of the PDF file
+            profiles: Profiles to preload, DEFAULT_PIPELINE_PROFILE when not given
+            
+        Returns:
+            The timings recorded so far
+        """
+        started = time.perf_counter()
+        for profile in profiles or [DEFAULT_PIPELINE_PROFILE]:
+            profile = PipelineProfile(profile)
+            for tables in _table_variants(profile):
+                for ocr in (False, True):
+                    self.converter_pool.preload(profile, ocr, tables)
+        self.timings["preload_models"] = round(time.perf_counter() - started, 3)
+        
+        if self.page_pool is not None:
+            started = time.perf_counter()
+            list(self.page_pool.map(_page_worker_ready, range(self.parallel_workers)))
+            self.timings["preload_page_workers"] = round(time.perf_counter() - started, 3)
+        
+        return self.timings
+    
+    def convert_pdf(self, pdf_path: str, profile: Optional[PipelineProfile] = None,
+                    pages: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Convert a PDF file, running OCR and table structure only on pages that need them
+        
+        Pages are grouped into runs by whether they lack a text layer and, for profiles
+        with "auto" table structure, whether they hold a table; each run is converted
+        with the matching converter. Large PDFs are split further across the process pool
+        when one is configured.
+        
+        Args:
+            pdf_path: Path of the PDF on local disk
+            profile: Pipeline profile, DEFAULT_PIPELINE_PROFILE when not given
+            pages: The scan_pdf result, when the caller already has it
+            
+        Returns:
+            Dict with the markdown (image placeholders kept), raw text, PNG bytes of each
+            picture and the number of pages that were OCRed
+        """
+        profile = PipelineProfile(profile or DEFAULT_PIPELINE_PROFILE)
+        ocr_mode = PIPELINE_PROFILES[profile]["ocr"]
+        pages = pages if pages is not None else scan_pdf(pdf_path)
+        page_count = len(pages)
+        if ocr_mode == "auto":
+            needs_ocr = [not page["text_layer"] for page in pages]
+        else:
+            needs_ocr = [ocr_mode == "always"] * page_count
+        ocr_pages = sum(needs_ocr)
+        table_mode = PIPELINE_PROFILES[profile]["table_structure"]
+        if table_mode == "auto":
+            needs_tables = [page["table"] for page in pages]
+        else:
+            needs_tables = [table_mode] * page_count
+        print(f"Converting {page_count} pages with the {profile.value} profile, OCR on {ocr_pages}")
+        
+        runs = _page_runs(needs_ocr, needs_tables)
+        parallel = self.page_pool is not None and page_count >= self.parallel_min_pages
+        
+        if len(runs) <= 1 and not parallel:
+            with self.converter_pool.converter(profile, ocr_pages > 0, any(needs_tables)) as converter:
+                conv_result = converter.convert(pdf_path)
+            conversion = self._extract_conversion(conv_result.document)
+            conversion["ocr_pages"] = ocr_pages
+            return conversion
+        
+        if not parallel:
+            parts = []
+            for start, end, ocr, tables in runs:
+                with self.converter_pool.converter(profile, ocr, tables) as converter:
+                    parts.append(_convert_range(converter, pdf_path, start, end))
+        else:
+            # Split the runs into page ranges, at least one per worker, and stitch the parts back in page order
+            part_count = max(self.parallel_workers, math.ceil(page_count / self.pages_per_part))
+            part_size = math.ceil(page_count / part_count)
+            ranges = [
+                (start, min(start + part_size, end), ocr, tables)
+                for run_start, end, ocr, tables in runs
+                for start in range(run_start, end, part_size)
+            ]
+            print(f"Converting {page_count} pages as {len(ranges)} parts on {self.parallel_workers} processes")
+            
+            parts = list(self.page_pool.map(
+                _convert_page_range,
+                [pdf_path] * len(ranges),
+                [start for start, _, _, _ in ranges],
+                [end for _, end, _, _ in ranges],
+                [profile] * len(ranges),
+                [ocr for _, _, ocr, _ in ranges],
+                [tables for _, _, _, tables in ranges]
+            ))
+        
+        return {
+            "markdown": "\n\n".join(part["markdown"] for part in parts if part["markdown"]),
+            "raw_text": "\n\n".join(part["raw_text"] for part in parts if part["raw_text"]),
+            "images": [image for part in parts for image in part["images"]],
+            "ocr_pages": ocr_pages
+        }
+    
+    def _convert_routed(self, pdf_path: str, profile: PipelineProfile) -> Tuple[Dict[str, Any], str]:
+        """
+        Convert with the fast extractor when the PDF qualifies, otherwise with Docling
+        
+        Returns:
+            The conversion and the name of the engine that produced it
+        """
+        # One pass over the text layer serves the assessment, the extraction and OCR routing
+        pages = scan_pdf(pdf_path)
+        if self.fast_path_enabled and PIPELINE_PROFILES[profile]["fast_path"]:
+            assessment = assess_pdf(pages)
+            if assessment["fast_path"]:
+                conversion = extract_markdown(pages)
+                conversion["ocr_pages"] = 0
+                return conversion, "pypdfium2"
+            print(f"Using Docling: {assessment['reason']}")
+        
+        started = time.perf_counter()
+        conversion = self.convert_pdf(pdf_path, profile, pages)
+        if "first_conversion" not in self.timings:
+            self.timings["first_conversion"] = round(time.perf_counter() - started, 3)
+            print(f"First Docling conversion took {self.timings['first_conversion']}s")
+        return conversion, "docling"
+    
+    def process_pdf(self, pdf_path: str, original_filename: str,
+                    progress: Optional[Callable[[str], None]] = None,
+                    profile: Optional[PipelineProfile] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Process a PDF file and extract its text content, storing in S3
+        
+        Simple born-digital PDFs go through the fast pypdfium2 extractor; anything with
+        scanned pages, tables or sparse text is converted with Docling.
+        
+        The PDF is read from disk and streamed to S3, so it is never held
+        in memory as a whole.
+        
+        Args:
+            pdf_path: Path of the PDF file on local disk
             original_filename: The original filename of the PDF
+            progress: Optional callback told each stage as it starts
+                ("convert", "markdown", "images", "storage")
+            profile: Pipeline profile, DEFAULT_PIPELINE_PROFILE when not given
             
         Returns:
             Tuple containing the raw text content, markdown formatted content, and metadata
         """
-        pdf_buffer = None
-        temp_file = None
-        
         try:
-            print("Processing with Docling...")
-            # Create a buffer from the file content
-            pdf_buffer = io.BytesIO(file_content)
+            print("Processing PDF...")
             
             # Get base name for file naming
             base_name = Path(original_filename).stem
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             document_id = f"{base_name}_{timestamp}"
             
-            # Create a temporary file for the PDF
-            with NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
-                # Write the PDF bytes to the temporary file
-                pdf_buffer.seek(0)
-                temp_file.write(pdf_buffer.read())
-                temp_file.flush()
-                temp_file_path = temp_file.name
-                
-                print(f"Created temporary file: {temp_file_path}")
-                
-                # Convert the PDF file using Docling
-                conv_result = self.doc_converter.convert(temp_file_path)
-                print("Document converted successfully")
-                
-                # Process the document and extract markdown
-                markdown_content = self._process_document(conv_result, document_id, base_name)
-                
-                # Extract raw text from the document
-                raw_text = self._extract_text_from_document(conv_result.document)
-                
-                # If we couldn't extract text, use the markdown content
-                if not raw_text.strip():
-                    print("Using markdown content as raw text")
-                    # Simple cleanup to get plain text from markdown
-                    raw_text = markdown_content.replace('#', '').replace('*', '')
-                
-                # Upload PDF to S3
-                pdf_url = upload_pdf_to_s3(file_content, original_filename, document_id)
-                
-                # Upload markdown to S3
-                markdown_url = upload_markdown_to_s3(markdown_content, document_id, base_name)
-                
-                metadata = {
-                    'document_id': document_id,
-                    'source_type': 'pdf',
-                    'original_filename': original_filename,
-                    'processing_date': timestamp,
-                    'content_type': 'document',
-                    'pdf_url': pdf_url,
-                    'markdown_url': markdown_url,
-                    'processor': 'docling'
-                }
-                
-                print("Docling processing successful")
-                return raw_text, markdown_content, metadata
+            # Convert the PDF file with the fast extractor or Docling
+            self._report(progress, "convert")
+            profile = PipelineProfile(profile or DEFAULT_PIPELINE_PROFILE)
+            conversion, processor = self._convert_routed(pdf_path, profile)
+            print(f"Document converted successfully with {processor}")
+            
+            # Extract raw text from the document
+            self._report(progress, "markdown")
+            raw_text = conversion["raw_text"]
+            
+            # If we couldn't extract text, use the markdown content
+            if not raw_text.strip():
+                print("Using markdown content as raw text")
+                # Simple cleanup to get plain text from markdown
+                raw_text = conversion["markdown"].replace('#', '').replace('*', '')
+            
+            # Attach the extracted images to the markdown
+            self._report(progress, "images")
+            markdown_content = self._attach_images(conversion["markdown"], conversion["images"], document_id, base_name)
+            
+            # Store the original PDF
+            self._report(progress, "storage")
+            pdf_url = self.storage.upload_pdf(pdf_path, original_filename, document_id)
+            
+            # Store the markdown
+            markdown_url = self.storage.upload_markdown(markdown_content, document_id, base_name)
+            
+            metadata = {
+                'document_id': document_id,
+                'source_type': 'pdf',
+                'original_filename': original_filename,
+                'processing_date': timestamp,
+                'content_type': 'document',
+                'pdf_url': pdf_url,
+                'markdown_url': markdown_url,
+                'processor': processor,
+                'pipeline_profile': profile.value,
+                'ocr_pages': conversion["ocr_pages"]
+            }
+            
+            print("PDF processing successful")
+            return raw_text, markdown_content, metadata
                 
         except Exception as e:
-            print(f"Docling processing failed: {str(e)}")
-            raise Exception(f"Failed to process PDF with Docling: {str(e)}")
-        finally:
-            # Clean up resources
-            if pdf_buffer:
-                pdf_buffer.close()
-            if temp_file and os.path.exists(temp_file_path):
-                try:
-                    os.unlink(temp_file_path)
-                except Exception as e:
-                    print(f"Warning: Could not delete temporary file {temp_file_path}: {str(e)}")
+            print(f"PDF processing failed: {str(e)}")
+            raise Exception(f"Failed to process PDF: {str(e)}")
     
-    def _process_document(self, conv_result, document_id: str, base_name: str) -> str:
+    def _report(self, progress: Optional[Callable[[str], None]], stage: str):
+        """Tell the progress callback a stage has started; progress reporting never fails processing"""
+        if progress is None:
+            return
+        try:
+            progress(stage)
+        except Exception as e:
+            print(f"Warning: Could not report progress for stage {stage}: {str(e)}")
+    
+    @staticmethod
+    def _extract_conversion(document) -> Dict[str, Any]:
         """
-        Process the converted document and handle images if present
+        Pull everything later steps need out of a converted Docling document
         
         Args:
-            conv_result: The conversion result from Docling
-            document_id: The document ID
-            base_name: The base name of the document
+            document: The Docling document
             
         Returns:
-            The markdown content with image references
+            Dict with the markdown (image placeholders kept), raw text and PNG bytes of each picture
         """
         try:
             # Try to export with PLACEHOLDER mode first
-            markdown_content = conv_result.document.export_to_markdown(image_mode=ImageRefMode.PLACEHOLDER)
+            markdown_content = document.export_to_markdown(image_mode=ImageRefMode.PLACEHOLDER)
         except Exception as e:
             print(f"Error exporting with PLACEHOLDER mode: {str(e)}")
             # Try with EMBEDDED mode
             try:
-                markdown_content = conv_result.document.export_to_markdown(image_mode=ImageRefMode.EMBEDDED)
+                markdown_content = document.export_to_markdown(image_mode=ImageRefMode.EMBEDDED)
             except Exception as e2:
                 print(f"Error exporting with EMBEDDED mode: {str(e2)}")
                 # Try without specifying image_mode
-                markdown_content = conv_result.document.export_to_markdown()
+                markdown_content = document.export_to_markdown()
         
-        # Process images if they exist in the document
-        picture_counter = 0
+        # Encode images if they exist in the document
+        images = []
         try:
-            for element, _level in conv_result.document.iterate_items():
+            for element, _level in document.iterate_items():
                 if isinstance(element, PictureItem):
-                    picture_counter += 1
-                    
-                    # Create a temporary file for the image
-                    with NamedTemporaryFile(suffix=".png", delete=False) as image_file:
-                        # Save the image to the temporary file
-                        element.get_image(conv_result.document).save(image_file, "PNG")
-                        image_file.flush()
-                        image_file_path = image_file.name
-                        
-                        # Define the S3 path for the image
-                        image_s3_key = f"documents/images/{document_id}/{base_name}_image_{picture_counter}.png"
-                        
-                        # Upload the image to S3
-                        with open(image_file_path, "rb") as fp:
-                            image_data = fp.read()
-                            image_url = upload_file_to_s3(image_data, image_s3_key, content_type="image/png")
-                        
-                        # Replace the image placeholder with the image URL
-                        markdown_content = markdown_content.replace("<!-- image -->", f"![Image]({image_url})", 1)
-                        
-                        # Clean up the temporary image file
-                        try:
-                            os.unlink(image_file_path)
-                        except Exception as e:
-                            print(f"Warning: Could not delete temporary image file {image_file_path}: {str(e)}")
+                    image_buffer = io.BytesIO()
+                    element.get_image(document).save(image_buffer, "PNG")
+                    images.append(image_buffer.getvalue())
         except Exception as e:
             print(f"Warning: Error processing images: {str(e)}")
             # Continue without images if there's an error
         
-        return markdown_content
+        return {
+            "markdown": markdown_content,
+            "raw_text": PDFProcessor._extract_text_from_document(document),
+            "images": images
+        }
+    
+    def _attach_images(self, markdown_content: str, images: List[bytes], document_id: str, base_name: str) -> str:
+        """
+        Upload the extracted images and point the markdown placeholders at them
+        
+        Args:
+            markdown_content: Markdown with one image placeholder per picture
+            images: PNG bytes of each picture, in document order
+            document_id: The document ID
+            base_name: The base name of the document
+            
+        Returns:
+            The markdown content with image references
+        """
+        # Identical pictures (logos, letterheads) are uploaded once and shared by every placeholder
+        image_refs = []
+        unique_images = {}
+        for picture_counter, image_data in enumerate(images, start=1):
+            digest = hashlib.sha256(image_data).hexdigest()
+            if digest not in unique_images:
+                image_s3_key = f"documents/images/{document_id}/{base_name}_image_{picture_counter}.png"
+                unique_images[digest] = (image_data, image_s3_key)
+            image_refs.append(digest)
+        
+        # The storage backend uploads the batch concurrently over its connection pool
+        uploads = self.storage.upload_files({
+            image_s3_key: (image_data, "image/png") for image_data, image_s3_key in unique_images.values()
+        })
+        image_urls = {}
+        for digest, (_, image_s3_key) in unique_images.items():
+            result = uploads.get(image_s3_key)
+            if isinstance(result, Exception):
+                print(f"Warning: Error processing images: {str(result)}")
+                # Continue without this image if its upload failed
+            elif result:
+                image_urls[digest] = result
+        
+        # Rewrite every placeholder in one pass over the markdown
+        parts = markdown_content.split(IMAGE_PLACEHOLDER)
+        rewritten = [parts[0]]
+        for index, part in enumerate(parts[1:]):
+            image_url = image_urls.get(image_refs[index]) if index < len(image_refs) else None
+            rewritten.append(f"![Image]({image_url})" if image_url else IMAGE_PLACEHOLDER)
+            rewritten.append(part)
+        
+        if len(unique_images) < len(images):
+            print(f"Uploaded {len(unique_images)} unique images for {len(images)} pictures")
+        
+        return "".join(rewritten)
     
-    def _extract_text_from_document(self, document) -> str:
+    @staticmethod
+    def _extract_text_from_document(document) -> str:
         """
         Extract text from a Docling document
         
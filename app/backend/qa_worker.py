@@ -3,6 +3,9 @@ import time
 from dotenv import load_dotenv
 from app.backend.redis_service import RedisService
 from app.backend.llm_service import LLMService
+from app.backend.utils import DocumentStore, resolve_document_content
+from app.backend.manifest import DocumentManifest
+from app.backend.vector_index import VectorIndexStore
 
 # Load environment variables
 load_dotenv()
@@ -11,32 +14,58 @@ def process_qa_request(data):
     """Process a QA request from Redis stream"""
     print(f"Processing QA request: {data['request_id']}")
     
-    # Initialize LLM service
-    llm_service = LLMService()
-    
     # Get model ID from request (default to Zephyr if not specified)
     model_id = data.get("model_id", "huggingface/HuggingFaceH4/zephyr-7b-beta")
     
+    if vector_index_store is not None and "content_hash" in data:
+        # Pick context from the document's chunk index; content is only loaded to build it
+        vector_index = vector_index_store.get_or_build(
+            data["document_id"],
+            data["content_hash"],
+            lambda: resolve_document_content(redis_service, document_store, data),
+            llm_service._chunk_document,
+            llm_service._count_tokens
+        )
+        content = None
+    else:
+        vector_index = None
+        content = resolve_document_content(redis_service, document_store, data)
+    
+    if content is None and vector_index is None:
+        print(f"Document {data['document_id']} not found for request {data['request_id']}")
+        redis_service.publish_qa_response(data["request_id"], "Unable to answer question: document not found.", {}, error=True)
+        return
+    
     # Answer question
-    answer, cost_info = llm_service.answer_question(data["content"], data["question"], model_id)
+    answer, cost_info, failed = llm_service.answer_question(content, data["question"], model_id, vector_index=vector_index)
     
     # Publish response back to Redis
     redis_service.publish_qa_response(
         data["request_id"],
         answer,
-        cost_info
+        cost_info,
+        error=failed
     )
     
     print(f"QA request {data['request_id']} processed")
 
 if __name__ == "__main__":
-    # Initialize Redis service
+    # Initialize Redis service and the store used when cached content has expired
     redis_service = RedisService()
+    document_store = DocumentStore(DocumentManifest(redis_service.redis_client))
+    document_store.storage.startup()
+    
+    # One LLM service per process so the tokenizer and HTTP connection pools are reused
+    llm_service = LLMService()
+    
+    # QA_RETRIEVAL=vector answers from persisted, memory-mapped chunk embeddings
+    vector_index_store = VectorIndexStore() if os.getenv("QA_RETRIEVAL", "bm25") == "vector" else None
     
     # Generate a unique consumer name
     consumer_name = f"qa_worker_{os.getpid()}"
     
-    print(f"Starting QA worker with consumer name: {consumer_name}")
+    print(f"Starting QA worker with consumer name: {consumer_name} "
+          f"(max in flight: {redis_service.worker_max_in_flight})")
     
     # Start consuming QA requests
     redis_service.consume_qa_requests(consumer_name, process_qa_request)
\ No newline at end of file
@@ -2,37 +2,113 @@ import os
 import json
 import time
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List, Callable
 import redis
+import redis.asyncio
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-class RedisService:
+class BaseRedisService:
+    """Stream names, reply keys and message layout shared by the sync and async services"""
+    
     def __init__(self):
-        """Initialize Redis connection using environment variables"""
-        redis_host = os.getenv("REDIS_HOST", "localhost")
-        redis_port = int(os.getenv("REDIS_PORT", "6379"))
+        """Read Redis settings from environment variables"""
+        self.redis_host = os.getenv("REDIS_HOST", "localhost")
+        self.redis_port = int(os.getenv("REDIS_PORT", "6379"))
         # redis_password = os.getenv("REDIS_PASSWORD", None)
         
-        # Connect to Redis
-        self.redis_client = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            # password=redis_password,
-            decode_responses=True  # Automatically decode responses to strings
-        )
-        
         # Define stream names
         self.summary_request_stream = "summary_requests"
-        self.summary_response_stream = "summary_responses"
         self.qa_request_stream = "qa_requests"
-        self.qa_response_stream = "qa_responses"
+        self.ingest_request_stream = "ingest_requests"
+        
+        # Ingestion job state lives in a hash per job and is kept for a day after the last update
+        self.ingest_job_prefix = "ingest_job"
+        self.ingest_job_ttl = int(os.getenv("INGEST_JOB_TTL", str(24 * 3600)))
+        
+        # Responses go to a per-request list so each waiter only sees its own reply
+        self.summary_response_prefix = "summary_response"
+        self.qa_response_prefix = "qa_response"
+        
+        # Uncollected replies (e.g. the API timed out) expire after this many seconds
+        self.response_ttl = int(os.getenv("REDIS_RESPONSE_TTL", "300"))
+        
+        # Requests only carry a content hash; the markdown itself is shared under this prefix
+        self.document_content_prefix = "document_content"
+        self.document_content_ttl = int(os.getenv("DOCUMENT_CONTENT_TTL", "3600"))
+        
+        # SHA-256 of uploaded PDF bytes -> document_id, so identical uploads skip conversion
+        self.pdf_hash_index = "pdf_hash_index"
+        
+        # Cold-start timings reported by each ingestion worker
+        self.ingest_worker_timings = "ingest_worker_timings"
         
         # Create consumer group names
         self.summary_consumer_group = "summary_processors"
         self.qa_consumer_group = "qa_processors"
+        self.ingest_consumer_group = "ingest_processors"
+        
+        # Requests a single worker process keeps in flight (they mostly wait on LLM APIs)
+        self.worker_max_in_flight = int(os.getenv("WORKER_MAX_IN_FLIGHT", "8"))
+    
+    def _response_key(self, prefix: str, request_id: str) -> str:
+        """Build the reply list key for a single request"""
+        return f"{prefix}:{request_id}"
+    
+    def _content_key(self, content_hash: str) -> str:
+        """Build the content-addressed cache key for a document's markdown"""
+        return f"{self.document_content_prefix}:{content_hash}"
+    
+    def _ingest_job_key(self, job_id: str) -> str:
+        """Build the hash key holding one ingestion job's state"""
+        return f"{self.ingest_job_prefix}:{job_id}"
+    
+    def _parse_ingest_job(self, job: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Turn the raw job hash into the job model, decoding the per-stage timings"""
+        if not job:
+            return None
+        job = dict(job)
+        job["stages"] = json.loads(job.get("stages", "{}"))
+        return job
+    
+    def _build_summary_request(self, document_id: str, content_hash: str, model_id: str) -> Dict[str, Any]:
+        """Build the stream message for a summary request"""
+        return {
+            "request_id": str(uuid.uuid4()),
+            "document_id": document_id,
+            "content_hash": content_hash,
+            "model_id": model_id,
+            "timestamp": time.time()
+        }
+    
+    def _build_qa_request(self, document_id: str, content_hash: str, question: str, model_id: str) -> Dict[str, Any]:
+        """Build the stream message for a question-answering request"""
+        return {
+            "request_id": str(uuid.uuid4()),
+            "document_id": document_id,
+            "content_hash": content_hash,
+            "question": question,
+            "model_id": model_id,
+            "timestamp": time.time()
+        }
+
+
+class RedisService(BaseRedisService):
+    def __init__(self):
+        """Initialize Redis connection using environment variables"""
+        super().__init__()
+        
+        # Connect to Redis
+        self.redis_client = redis.Redis(
+            host=self.redis_host,
+            port=self.redis_port,
+            # password=redis_password,
+            decode_responses=True  # Automatically decode responses to strings
+        )
         
         # Initialize streams and consumer groups
         self._initialize_streams()
@@ -61,17 +137,34 @@ class RedisService:
         except redis.exceptions.ResponseError as e:
             # Group already exists
             pass
+            
+        try:
+            self.redis_client.xgroup_create(
+                self.ingest_request_stream, 
+                self.ingest_consumer_group,
+                mkstream=True,
+                id='0'
+            )
+        except redis.exceptions.ResponseError as e:
+            # Group already exists
+            pass
     
-    def publish_summary_request(self, document_id: str, content: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta") -> str:
+    def cache_document_content(self, content_hash: str, content: str):
+        """
+        Make a document's markdown available to workers under its content hash
+        Refreshes the TTL without resending the content if it is already cached
+        """
+        key = self._content_key(content_hash)
+        if not self.redis_client.expire(key, self.document_content_ttl):
+            self.redis_client.set(key, content, ex=self.document_content_ttl)
+    
+    def get_cached_document_content(self, content_hash: str) -> Optional[str]:
+        """Get a document's markdown by content hash, or None if it has expired"""
+        return self.redis_client.get(self._content_key(content_hash))
+    
+    def publish_summary_request(self, document_id: str, content_hash: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta") -> str:
         """Publish a summary request to the summary request stream"""
-        request_id = str(uuid.uuid4())
-        message = {
-            "request_id": request_id,
-            "document_id": document_id,
-            "content": content,
-            "model_id": model_id,
-            "timestamp": time.time()
-        }
+        message = self._build_summary_request(document_id, content_hash, model_id)
         
         self.redis_client.xadd(
             self.summary_request_stream,
@@ -80,19 +173,11 @@ class RedisService:
             }
         )
         
-        return request_id
+        return message["request_id"]
     
-    def publish_qa_request(self, document_id: str, content: str, question: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta") -> str:
+    def publish_qa_request(self, document_id: str, content_hash: str, question: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta") -> str:
         """Publish a question-answering request to the QA request stream"""
-        request_id = str(uuid.uuid4())
-        message = {
-            "request_id": request_id,
-            "document_id": document_id,
-            "content": content,
-            "question": question,
-            "model_id": model_id,
-            "timestamp": time.time()
-        }
+        message = self._build_qa_request(document_id, content_hash, question, model_id)
         
         self.redis_client.xadd(
             self.qa_request_stream,
@@ -101,170 +186,331 @@ class RedisService:
             }
         )
         
-        return request_id
+        return message["request_id"]
     
-    def get_summary_response(self, request_id: str, timeout: int = 30) -> Optional[Dict[str, Any]]:
+    def _wait_for_response(self, key: str, timeout: int) -> Optional[Dict[str, Any]]:
         """
-        Poll for a summary response with the given request_id
+        Block on the reply list until the worker pushes the response
         Returns None if timeout is reached
         """
-        start_time = time.time()
+        result = self.redis_client.blpop([key], timeout=timeout)
+        if not result:
+            return None
         
-        while time.time() - start_time < timeout:
-            # Read all messages from the response stream
-            messages = self.redis_client.xread(
-                {self.summary_response_stream: '0'},
-                block=1000,  # Block for 1 second
-                count=10
-            )
-            
-            if messages:
-                for _, message_list in messages:
-                    for message_id, message_data in message_list:
-                        data = json.loads(message_data["data"])
-                        if data.get("request_id") == request_id:
-                            # Acknowledge the message
-                            self.redis_client.xdel(self.summary_response_stream, message_id)
-                            return data
-            
-            # Sleep briefly to avoid hammering Redis
-            time.sleep(0.1)
-        
-        return None
+        _, payload = result
+        return json.loads(payload)
+    
+    def _publish_response(self, key: str, message: Dict[str, Any]):
+        """Push a response onto its reply list and bound how long it can linger"""
+        pipeline = self.redis_client.pipeline()
+        pipeline.rpush(key, json.dumps(message))
+        pipeline.expire(key, self.response_ttl)
+        pipeline.execute()
+    
+    def get_summary_response(self, request_id: str, timeout: int = 30) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the summary response with the given request_id
+        Returns None if timeout is reached
+        """
+        key = self._response_key(self.summary_response_prefix, request_id)
+        return self._wait_for_response(key, timeout)
     
     def get_qa_response(self, request_id: str, timeout: int = 30) -> Optional[Dict[str, Any]]:
         """
-        Poll for a QA response with the given request_id
+        Wait for the QA response with the given request_id
         Returns None if timeout is reached
         """
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            # Read all messages from the response stream
-            messages = self.redis_client.xread(
-                {self.qa_response_stream: '0'},
-                block=1000,  # Block for 1 second
-                count=10
-            )
-            
-            if messages:
-                for _, message_list in messages:
-                    for message_id, message_data in message_list:
-                        data = json.loads(message_data["data"])
-                        if data.get("request_id") == request_id:
-                            # Acknowledge the message
-                            self.redis_client.xdel(self.qa_response_stream, message_id)
-                            return data
-            
-            # Sleep briefly to avoid hammering Redis
-            time.sleep(0.1)
-        
-        return None
+        key = self._response_key(self.qa_response_prefix, request_id)
+        return self._wait_for_response(key, timeout)
     
-    def consume_summary_requests(self, consumer_name: str, callback: Callable[[Dict[str, Any]], None]):
+    def _process_message(self, stream: str, group: str, message_id: str, message_data: Dict[str, Any],
+                         callback: Callable[[Dict[str, Any]], None], slots: threading.BoundedSemaphore):
+        """Run the callback for one message, ack it as soon as it completes and free its slot"""
+        try:
+            data = json.loads(message_data["data"])
+            # Process the message with the callback
+            callback(data)
+            # Acknowledge the message
+            self.redis_client.xack(stream, group, message_id)
+        except Exception as e:
+            print(f"Error processing message: {e}")
+        finally:
+            slots.release()
+    
+    def _consume_stream(self, stream: str, group: str, consumer_name: str,
+                        callback: Callable[[Dict[str, Any]], None], max_in_flight: Optional[int] = None,
+                        stop: Optional[threading.Event] = None):
         """
-        Consume summary requests from the stream and process them with the callback
-        This is meant to be run in a separate process or thread
+        Consume a request stream in batches, keeping up to max_in_flight messages processing at once
+        Each message is acked independently when its callback finishes. When stop is set, the
+        consumer returns after its current read, once the messages in flight have finished
         """
-        while True:
+        max_in_flight = max_in_flight or self.worker_max_in_flight
+        slots = threading.BoundedSemaphore(max_in_flight)
+        executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=consumer_name)
+        
+        while stop is None or not stop.is_set():
+            # Wait for one free slot, then grab as many more as are available right now
+            slots.acquire()
+            free_slots = 1
+            while free_slots < max_in_flight and slots.acquire(blocking=False):
+                free_slots += 1
+            
             try:
-                # Read new messages from the stream
+                # Read at most one new message per free slot
                 messages = self.redis_client.xreadgroup(
-                    groupname=self.summary_consumer_group,
+                    groupname=group,
                     consumername=consumer_name,
-                    streams={self.summary_request_stream: '>'},
-                    count=1,
+                    streams={stream: '>'},
+                    count=free_slots,
                     block=2000  # Block for 2 seconds
                 )
                 
-                if not messages:
-                    continue
-                
-                for stream_name, message_list in messages:
+                for stream_name, message_list in messages or []:
                     for message_id, message_data in message_list:
-                        try:
-                            data = json.loads(message_data["data"])
-                            # Process the message with the callback
-                            callback(data)
-                            # Acknowledge the message
-                            self.redis_client.xack(
-                                self.summary_request_stream,
-                                self.summary_consumer_group,
-                                message_id
-                            )
-                        except Exception as e:
-                            print(f"Error processing message: {e}")
+                        free_slots -= 1
+                        executor.submit(
+                            self._process_message, stream, group, message_id, message_data, callback, slots
+                        )
             
             except Exception as e:
                 print(f"Error consuming messages: {e}")
                 time.sleep(1)  # Wait before retrying
+            finally:
+                # Hand back the slots no message was read for
+                for _ in range(free_slots):
+                    slots.release()
+        
+        executor.shutdown(wait=True)
+    
+    def consume_summary_requests(self, consumer_name: str, callback: Callable[[Dict[str, Any]], None],
+                                 max_in_flight: Optional[int] = None):
+        """
+        Consume summary requests from the stream and process them with the callback
+        This is meant to be run in a separate process or thread
+        """
+        self._consume_stream(
+            self.summary_request_stream,
+            self.summary_consumer_group,
+            consumer_name,
+            callback,
+            max_in_flight
+        )
     
-    def consume_qa_requests(self, consumer_name: str, callback: Callable[[Dict[str, Any]], None]):
+    def consume_qa_requests(self, consumer_name: str, callback: Callable[[Dict[str, Any]], None],
+                            max_in_flight: Optional[int] = None):
         """
         Consume QA requests from the stream and process them with the callback
         This is meant to be run in a separate process or thread
         """
-        while True:
-            try:
-                # Read new messages from the stream
-                messages = self.redis_client.xreadgroup(
-                    groupname=self.qa_consumer_group,
-                    consumername=consumer_name,
-                    streams={self.qa_request_stream: '>'},
-                    count=1,
-                    block=2000  # Block for 2 seconds
-                )
-                
-                if not messages:
-                    continue
-                
-                for stream_name, message_list in messages:
-                    for message_id, message_data in message_list:
-                        try:
-                            data = json.loads(message_data["data"])
-                            # Process the message with the callback
-                            callback(data)
-                            # Acknowledge the message
-                            self.redis_client.xack(
-                                self.qa_request_stream,
-                                self.qa_consumer_group,
-                                message_id
-                            )
-                        except Exception as e:
-                            print(f"Error processing message: {e}")
-            
-            except Exception as e:
-                print(f"Error consuming messages: {e}")
-                time.sleep(1)  # Wait before retrying
+        self._consume_stream(
+            self.qa_request_stream,
+            self.qa_consumer_group,
+            consumer_name,
+            callback,
+            max_in_flight
+        )
+    
+    def consume_ingest_requests(self, consumer_name: str, callback: Callable[[Dict[str, Any]], None],
+                                max_in_flight: Optional[int] = None):
+        """
+        Consume PDF ingestion requests from the stream and process them with the callback
+        This is meant to be run in a separate process or thread
+        """
+        self._consume_stream(
+            self.ingest_request_stream,
+            self.ingest_consumer_group,
+            consumer_name,
+            callback,
+            max_in_flight
+        )
+    
+    def update_ingest_job(self, job_id: str, stages: Optional[Dict[str, float]] = None, **fields):
+        """Update an ingestion job's status fields and, if given, its per-stage timings"""
+        fields = {name: value for name, value in fields.items() if value is not None}
+        fields["updated_at"] = time.time()
+        if stages is not None:
+            fields["stages"] = json.dumps(stages)
+        
+        key = self._ingest_job_key(job_id)
+        pipeline = self.redis_client.pipeline()
+        pipeline.hset(key, mapping=fields)
+        pipeline.expire(key, self.ingest_job_ttl)
+        pipeline.execute()
+    
+    def set_document_id_for_pdf_hash(self, pdf_hash: str, document_id: str):
+        """Record which document a PDF hash was ingested as"""
+        self.redis_client.hset(self.pdf_hash_index, pdf_hash, document_id)
+    
+    def record_worker_timings(self, consumer_name: str, timings: Dict[str, Any]):
+        """Store an ingestion worker's startup and first-conversion timings, tagged with the release"""
+        record = {
+            "timings": timings,
+            "release": os.getenv("APP_RELEASE", "unknown"),
+            "timestamp": time.time()
+        }
+        self.redis_client.hset(self.ingest_worker_timings, consumer_name, json.dumps(record))
     
-    def publish_summary_response(self, request_id: str, summary: str, cost_info: Dict[str, Any]):
-        """Publish a summary response to the summary response stream"""
+    def publish_summary_response(self, request_id: str, summary: str, cost_info: Dict[str, Any], error: bool = False):
+        """
+        Publish a summary response to the reply list of its request
+        error marks a summary that is a failure message, which the API never caches
+        """
         message = {
             "request_id": request_id,
             "summary": summary,
             "cost": cost_info,
+            "error": error,
             "timestamp": time.time()
         }
         
-        self.redis_client.xadd(
-            self.summary_response_stream,
-            {
-                "data": json.dumps(message)
-            }
-        )
+        key = self._response_key(self.summary_response_prefix, request_id)
+        self._publish_response(key, message)
     
-    def publish_qa_response(self, request_id: str, answer: str, cost_info: Dict[str, Any]):
-        """Publish a QA response to the QA response stream"""
+    def publish_qa_response(self, request_id: str, answer: str, cost_info: Dict[str, Any], error: bool = False):
+        """
+        Publish a QA response to the reply list of its request
+        error marks an answer that is a failure message, which the API never caches
+        """
         message = {
             "request_id": request_id,
             "answer": answer,
             "cost": cost_info,
+            "error": error,
             "timestamp": time.time()
         }
         
-        self.redis_client.xadd(
-            self.qa_response_stream,
-            {
-                "data": json.dumps(message)
-            }
-        ) 
\ No newline at end of file
+        key = self._response_key(self.qa_response_prefix, request_id)
+        self._publish_response(key, message)
+
+
+class AsyncRedisService(BaseRedisService):
+    """
+    Non-blocking variant of RedisService for the API built on redis.asyncio
+    Only covers the publish/wait side; workers keep using RedisService
+    """
+    
+    def __init__(self):
+        """Initialize the asyncio Redis connection pool using environment variables"""
+        super().__init__()
+        
+        # Every pending BLPOP holds a connection, so the pool has to cover all in-flight waits
+        self.redis_client = redis.asyncio.Redis(
+            host=self.redis_host,
+            port=self.redis_port,
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "1000")),
+            decode_responses=True
+        )
+    
+    async def cache_document_content(self, content_hash: str, content: str):
+        """
+        Make a document's markdown available to workers under its content hash
+        Refreshes the TTL without resending the content if it is already cached
+        """
+        key = self._content_key(content_hash)
+        if not await self.redis_client.expire(key, self.document_content_ttl):
+            await self.redis_client.set(key, content, ex=self.document_content_ttl)
+    
+    async def get_document_id_by_pdf_hash(self, pdf_hash: str) -> Optional[str]:
+        """Return the document already ingested from a PDF with this hash, if any"""
+        return await self.redis_client.hget(self.pdf_hash_index, pdf_hash)
+    
+    async def set_document_id_for_pdf_hash(self, pdf_hash: str, document_id: str):
+        """Record which document a PDF hash was ingested as"""
+        await self.redis_client.hset(self.pdf_hash_index, pdf_hash, document_id)
+    
+    async def remove_pdf_hash(self, pdf_hash: str):
+        """Forget a PDF hash whose document no longer exists"""
+        await self.redis_client.hdel(self.pdf_hash_index, pdf_hash)
+    
+    async def create_ingest_job(self, job_id: str, staged_key: str, original_filename: str, pdf_hash: str,
+                                options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Record a queued ingestion job and publish it to the ingestion stream
+        
+        Args:
+            job_id: ID of the new job
+            staged_key: Storage key of the uploaded PDF
+            original_filename: Filename the user uploaded
+            pdf_hash: SHA-256 of the PDF bytes
+            options: Processing options passed through to the ingestion worker
+            
+        Returns:
+            The job as stored
+        """
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": "queued",
+            "original_filename": original_filename,
+            "pdf_hash": pdf_hash,
+            "stages": "{}",
+            "created_at": now,
+            "updated_at": now
+        }
+        message = {
+            "job_id": job_id,
+            "staged_key": staged_key,
+            "original_filename": original_filename,
+            "pdf_hash": pdf_hash,
+            "options": options or {},
+            "timestamp": now
+        }
+        
+        key = self._ingest_job_key(job_id)
+        pipeline = self.redis_client.pipeline()
+        pipeline.hset(key, mapping=job)
+        pipeline.expire(key, self.ingest_job_ttl)
+        pipeline.xadd(self.ingest_request_stream, {"data": json.dumps(message)})
+        await pipeline.execute()
+        
+        return self._parse_ingest_job({name: str(value) for name, value in job.items()})
+    
+    async def get_ingest_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get an ingestion job's current state, or None if it is unknown or expired"""
+        return self._parse_ingest_job(await self.redis_client.hgetall(self._ingest_job_key(job_id)))
+    
+    async def publish_summary_request(self, document_id: str, content_hash: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta") -> str:
+        """Publish a summary request to the summary request stream"""
+        message = self._build_summary_request(document_id, content_hash, model_id)
+        await self.redis_client.xadd(self.summary_request_stream, {"data": json.dumps(message)})
+        return message["request_id"]
+    
+    async def publish_qa_request(self, document_id: str, content_hash: str, question: str, model_id: str = "huggingface/HuggingFaceH4/zephyr-7b-beta") -> str:
+        """Publish a question-answering request to the QA request stream"""
+        message = self._build_qa_request(document_id, content_hash, question, model_id)
+        await self.redis_client.xadd(self.qa_request_stream, {"data": json.dumps(message)})
+        return message["request_id"]
+    
+    async def _wait_for_response(self, key: str, timeout: int) -> Optional[Dict[str, Any]]:
+        """
+        Await the reply list until the worker pushes the response
+        Returns None if timeout is reached
+        """
+        result = await self.redis_client.blpop([key], timeout=timeout)
+        if not result:
+            return None
+        
+        _, payload = result
+        return json.loads(payload)
+    
+    async def get_summary_response(self, request_id: str, timeout: int = 30) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the summary response with the given request_id
+        Returns None if timeout is reached
+        """
+        key = self._response_key(self.summary_response_prefix, request_id)
+        return await self._wait_for_response(key, timeout)
+    
+    async def get_qa_response(self, request_id: str, timeout: int = 30) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the QA response with the given request_id
+        Returns None if timeout is reached
+        """
+        key = self._response_key(self.qa_response_prefix, request_id)
+        return await self._wait_for_response(key, timeout)
+    
+    async def close(self):
+        """Close the connection pool"""
+        await self.redis_client.aclose()
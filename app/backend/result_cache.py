@@ -0,0 +1,300 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Set
+
+from .llm_service import SUMMARY_PROMPT_VERSION
+
+QA_CACHE_PREFIX = "qa_cache"
+
+QUESTION_WORD_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+# Wording changes that do not change what is being asked: auxiliaries fold only
+# within a tense, since "is revenue up" and "was revenue up" ask about different periods
+AUXILIARY_FORMS = {
+    "are": "is", "am": "is",
+    "were": "was",
+    "does": "do",
+    "has": "have",
+}
+
+# Function words a near-duplicate question may add, drop or swap; every other term,
+# auxiliaries and numbers included, has to match exactly
+QUESTION_STOPWORDS = {
+    "a", "an", "the", "of", "please", "tell", "me", "us", "you", "i",
+    "this", "that", "these", "those",
+}
+
+
+class RedisLRUCache:
+    """
+    Base for result caches in Redis: entries expire after a TTL and the least recently
+    used are evicted past max_entries; evicted entries can optionally spill to local
+    disk and be promoted back on a hit
+    """
+    
+    def __init__(self, redis_client, prefix: str, ttl: int, max_entries: int, spill_dir: Optional[str] = None):
+        """
+        Args:
+            redis_client: redis.asyncio client shared with the API
+            prefix: Key prefix of this cache
+            ttl: Seconds an entry lives without being read
+            max_entries: Entries kept in Redis before LRU eviction
+            spill_dir: Directory evicted entries spill to, or None to drop them
+        """
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        
+        self.lru_key = f"{self.prefix}:lru"
+        self.stats_key = f"{self.prefix}:stats"
+    
+    def _spill_path(self, key: str) -> Path:
+        return self.spill_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+    
+    def _read_spill(self, key: str) -> Optional[str]:
+        path = self._spill_path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                return None
+            return path.read_text()
+        except FileNotFoundError:
+            return None
+    
+    def _write_spill(self, entries: Dict[str, str]):
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        for key, payload in entries.items():
+            self._spill_path(key).write_text(payload)
+    
+    async def _fetch(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read an entry, promoting it from disk if it was spilled, and mark it recently used"""
+        payload = await self.redis_client.get(key)
+        
+        if payload is None and self.spill_dir is not None:
+            payload = await asyncio.to_thread(self._read_spill, key)
+            if payload is not None:
+                # Promote the spilled entry back into Redis
+                await self._store(key, payload)
+        
+        if payload is None:
+            return None
+        
+        pipeline = self.redis_client.pipeline()
+        pipeline.expire(key, self.ttl)
+        pipeline.zadd(self.lru_key, {key: time.time()})
+        await pipeline.execute()
+        return json.loads(payload)
+    
+    async def _count(self, counter: str):
+        await self.redis_client.hincrby(self.stats_key, counter, 1)
+    
+    async def _store(self, key: str, payload: str):
+        """Write one entry and evict the least recently used ones past max_entries"""
+        pipeline = self.redis_client.pipeline()
+        pipeline.set(key, payload, ex=self.ttl)
+        pipeline.zadd(self.lru_key, {key: time.time()})
+        pipeline.zcard(self.lru_key)
+        _, _, size = await pipeline.execute()
+        
+        if size > self.max_entries:
+            await self._evict(size - self.max_entries)
+    
+    async def _evict(self, count: int):
+        """Drop the least recently used entries, spilling them to disk if configured"""
+        evicted: List[str] = [key for key, _ in await self.redis_client.zpopmin(self.lru_key, count)]
+        if not evicted:
+            return
+        
+        if self.spill_dir is not None:
+            payloads = await self.redis_client.mget(evicted)
+            entries = {key: payload for key, payload in zip(evicted, payloads) if payload is not None}
+            await asyncio.to_thread(self._write_spill, entries)
+        
+        pipeline = self.redis_client.pipeline()
+        pipeline.delete(*evicted)
+        pipeline.hincrby(self.stats_key, "evictions", len(evicted))
+        await pipeline.execute()
+    
+    async def get_stats(self) -> Dict[str, int]:
+        """Return the cache counters"""
+        stats = await self.redis_client.hgetall(self.stats_key)
+        return {name: int(stats.get(name, 0)) for name in self.counters}
+
+
+class SummaryCache(RedisLRUCache):
+    """Cache of finished summaries, keyed by (content hash, model, prompt version)"""
+    
+    counters = ("hits", "misses", "evictions")
+    
+    def __init__(self, redis_client, ttl: Optional[int] = None, max_entries: Optional[int] = None,
+                 spill_dir: Optional[str] = None):
+        super().__init__(
+            redis_client,
+            prefix="summary_cache",
+            ttl=ttl or int(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600))),
+            max_entries=max_entries or int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000")),
+            spill_dir=spill_dir or os.getenv("SUMMARY_CACHE_SPILL_DIR")
+        )
+    
+    def _key(self, content_hash: str, model_id: str) -> str:
+        return f"{self.prefix}:{content_hash}:{model_id}:{SUMMARY_PROMPT_VERSION}"
+    
+    async def get(self, content_hash: str, model_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached summary response
+        Returns None on a miss
+        """
+        entry = await self._fetch(self._key(content_hash, model_id))
+        await self._count("hits" if entry else "misses")
+        return entry
+    
+    async def set(self, content_hash: str, model_id: str, response: Dict[str, Any]):
+        """Cache a summary response unless the worker flagged it as a failure"""
+        if response.get("error"):
+            return
+        
+        payload = json.dumps({"summary": response["summary"], "cost": response["cost"]})
+        await self._store(self._key(content_hash, model_id), payload)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(QUESTION_WORD_PATTERN.findall(question.lower()))
+
+
+def question_terms(normalized_question: str) -> Set[str]:
+    """Word set used to compare questions, with auxiliary verb forms folded together"""
+    return {AUXILIARY_FORMS.get(word, word) for word in normalized_question.split()}
+
+
+def question_similarity(a: str, b: str) -> float:
+    """
+    Jaccard similarity of two normalized questions
+    Questions whose content terms differ score 0, so a change of year, quarter or
+    entity is never treated as the same question however many words they share
+    """
+    terms_a, terms_b = question_terms(a), question_terms(b)
+    if not terms_a or not terms_b:
+        return 0.0
+    if terms_a - QUESTION_STOPWORDS != terms_b - QUESTION_STOPWORDS:
+        return 0.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+
+class QACache(RedisLRUCache):
+    """
+    Cache of answers keyed by (content hash, model, normalized question)
+    With a similarity threshold, a miss falls back to the most similar question already
+    answered for the same document and model. Keys are content-addressed, so a
+    reprocessed document with different markdown never reads an earlier answer
+    """
+    
+    counters = ("hits", "similar_hits", "misses", "evictions")
+    
+    def __init__(self, redis_client, ttl: Optional[int] = None, max_entries: Optional[int] = None,
+                 similarity_threshold: Optional[float] = None):
+        super().__init__(
+            redis_client,
+            prefix=QA_CACHE_PREFIX,
+            ttl=ttl or int(os.getenv("QA_CACHE_TTL", str(24 * 3600))),
+            max_entries=max_entries or int(os.getenv("QA_CACHE_MAX_ENTRIES", "20000"))
+        )
+        # 0 disables near-duplicate matching
+        if similarity_threshold is None:
+            similarity_threshold = float(os.getenv("QA_CACHE_SIMILARITY", "0.8"))
+        self.similarity_threshold = similarity_threshold
+        self.max_questions_per_document = int(os.getenv("QA_CACHE_MAX_QUESTIONS_PER_DOCUMENT", "500"))
+    
+    def _key(self, content_hash: str, model_id: str, normalized_question: str) -> str:
+        question_hash = hashlib.sha256(normalized_question.encode("utf-8")).hexdigest()[:32]
+        return f"{self.prefix}:{content_hash}:{model_id}:{question_hash}"
+    
+    def _questions_key(self, content_hash: str, model_id: str) -> str:
+        return f"{self.prefix}:questions:{content_hash}:{model_id}"
+    
+    async def get(self, content_hash: str, model_id: str, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer for the question or, failing that, a near-duplicate of it
+        Returns None on a miss
+        """
+        normalized = normalize_question(question)
+        entry = await self._fetch(self._key(content_hash, model_id, normalized))
+        if entry:
+            await self._count("hits")
+            return entry
+        
+        if self.similarity_threshold > 0:
+            questions_key = self._questions_key(content_hash, model_id)
+            known = await self.redis_client.hgetall(questions_key)
+            best_score, best_question = 0.0, None
+            for candidate in known:
+                score = question_similarity(normalized, candidate)
+                if score > best_score:
+                    best_score, best_question = score, candidate
+            
+            if best_question is not None and best_score >= self.similarity_threshold:
+                entry = await self._fetch(known[best_question])
+                if entry:
+                    await self._count("similar_hits")
+                    return entry
+                # The entry was evicted; forget the question as well
+                await self.redis_client.hdel(questions_key, best_question)
+        
+        await self._count("misses")
+        return None
+    
+    async def set(self, content_hash: str, model_id: str, question: str, response: Dict[str, Any]):
+        """Cache an answer unless the worker flagged it as a failure"""
+        if response.get("error"):
+            return
+        
+        normalized = normalize_question(question)
+        key = self._key(content_hash, model_id, normalized)
+        payload = json.dumps({"answer": response["answer"], "cost": response["cost"], "question": question})
+        await self._store(key, payload)
+        
+        questions_key = self._questions_key(content_hash, model_id)
+        if self.similarity_threshold > 0 and await self.redis_client.hlen(questions_key) < self.max_questions_per_document:
+            pipeline = self.redis_client.pipeline()
+            pipeline.hset(questions_key, normalized, key)
+            pipeline.expire(questions_key, self.ttl)
+            await pipeline.execute()
+
+
+class ChunkSummaryStore:
+    """
+    Global, content-addressed store of per-chunk summaries used by the summary workers
+    Keys hash the chunk text with the model and prompt version, so any document that
+    contains the same chunk reuses its summary. Uses the synchronous worker client
+    """
+    
+    def __init__(self, redis_client, ttl: Optional[int] = None):
+        self.redis_client = redis_client
+        self.ttl = ttl or int(os.getenv("CHUNK_SUMMARY_TTL", str(30 * 24 * 3600)))
+        self.prefix = "chunk_summary"
+    
+    def _key(self, model_id: str, chunk: str) -> str:
+        digest = hashlib.sha256(f"{model_id}\0{SUMMARY_PROMPT_VERSION}\0{chunk}".encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{digest}"
+    
+    def get_many(self, model_id: str, chunks: List[str]) -> List[Optional[str]]:
+        """Look up the summaries of several chunks; None where a chunk has not been summarized"""
+        if not chunks:
+            return []
+        return self.redis_client.mget([self._key(model_id, chunk) for chunk in chunks])
+    
+    def set_many(self, model_id: str, summaries: Dict[str, str]):
+        """Store chunk -> summary pairs; callers pass only summaries from successful calls"""
+        if not summaries:
+            return
+        pipeline = self.redis_client.pipeline()
+        for chunk, summary in summaries.items():
+            pipeline.set(self._key(model_id, chunk), summary, ex=self.ttl)
+        pipeline.execute()
@@ -0,0 +1,75 @@
+import re
+import math
+from collections import Counter
+from typing import List, Tuple
+
+# Words too common to say anything about which chunk answers a question
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from",
+    "has", "have", "how", "in", "is", "it", "its", "of", "on", "or", "that", "the",
+    "this", "to", "was", "were", "what", "when", "where", "which", "who", "why", "with"
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase the text and split it into terms, keeping decimals like 158.9 whole"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 keyword index over the chunks of one document"""
+    
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Build the index
+        
+        Args:
+            chunks: The document chunks, in document order
+            k1: Term frequency saturation
+            b: Length normalization strength
+        """
+        self.k1 = k1
+        self.b = b
+        self.chunk_count = len(chunks)
+        
+        self.term_frequencies = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.chunk_lengths = [sum(frequencies.values()) for frequencies in self.term_frequencies]
+        self.average_length = (sum(self.chunk_lengths) / self.chunk_count) if self.chunk_count else 0.0
+        
+        document_frequencies = Counter()
+        for frequencies in self.term_frequencies:
+            document_frequencies.update(frequencies.keys())
+        
+        self.idf = {
+            term: math.log(1 + (self.chunk_count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+    
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Rank chunks against the query
+        
+        Args:
+            query: The question text
+            top_k: Maximum number of chunks to return
+            
+        Returns:
+            (chunk index, score) pairs, best first; only chunks sharing a term with the query
+        """
+        query_terms = set(tokenize(query))
+        scores = []
+        
+        for index, frequencies in enumerate(self.term_frequencies):
+            length_norm = self.k1 * (1 - self.b + self.b * self.chunk_lengths[index] / (self.average_length or 1))
+            score = 0.0
+            for term in query_terms:
+                frequency = frequencies.get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + length_norm)
+            if score > 0:
+                scores.append((index, score))
+        
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:top_k]
@@ -0,0 +1,100 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple, Callable, Iterable
+
+from .s3_utils import get_s3_client, AWS_S3_BUCKET_NAME, S3_MAX_POOL_CONNECTIONS
+
+# What a bulk upload takes per key: the body and its content type
+UploadItem = Tuple[bytes, Optional[str]]
+
+
+class S3TransferClient:
+    """
+    Pooled S3 transfers: single requests and concurrent batches of head/get/upload
+    run on a thread pool sized to the client's connection pool, so a batch keeps
+    every connection busy without queueing for one
+
+    Pass client and bucket to run against moto or a local S3 stand-in; by default
+    the shared client from get_s3_client is used, which honours AWS_S3_ENDPOINT_URL.
+    """
+
+    def __init__(self, client=None, bucket: Optional[str] = None, max_workers: Optional[int] = None):
+        self._client = client
+        self.bucket = bucket or AWS_S3_BUCKET_NAME
+        self.max_workers = max_workers or S3_MAX_POOL_CONNECTIONS
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="s3-transfer")
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_s3_client()
+        return self._client
+
+    def _is_missing(self, error: Exception) -> bool:
+        response = getattr(error, "response", None) or {}
+        return response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def head(self, key: str) -> Optional[Dict[str, Any]]:
+        """Object metadata, or None if the key does not exist"""
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            if self._is_missing(e):
+                return None
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Object body, or None if the key does not exist"""
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except Exception as e:
+            if self._is_missing(e):
+                return None
+            raise
+
+    def put(self, key: str, body: bytes, content_type: Optional[str] = None, **extra_args) -> str:
+        """Upload an object and return its key"""
+        if content_type:
+            extra_args["ContentType"] = content_type
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=body, **extra_args)
+        return key
+
+    def map(self, function: Callable, items: Iterable) -> Dict[Any, Any]:
+        """
+        Call function on every item concurrently
+
+        Returns:
+            Dict of item to result, or to the exception the call raised, in input order
+        """
+        items = list(items)
+        futures = [self.executor.submit(function, item) for item in items]
+        results = {}
+        for item, future in zip(items, futures):
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                results[item] = e
+        return results
+
+    def head_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return self.map(self.head, keys)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return self.map(self.get, keys)
+
+    def upload_many(self, items: Dict[str, UploadItem], **extra_args) -> Dict[str, Any]:
+        """Upload several objects at once; returns key to key, or to the exception of a failed upload"""
+        return self.map(lambda key: self.put(key, items[key][0], items[key][1], **extra_args), items)
+
+
+_transfer_client = None
+_transfer_lock = threading.Lock()
+
+
+def get_transfer_client() -> S3TransferClient:
+    """The process-wide transfer client on the shared S3 client"""
+    global _transfer_client
+    with _transfer_lock:
+        if _transfer_client is None:
+            _transfer_client = S3TransferClient()
+        return _transfer_client
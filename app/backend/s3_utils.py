@@ -1,7 +1,8 @@
-import boto3
 import os
+import threading
 from dotenv import load_dotenv
-from botocore.exceptions import NoCredentialsError
+from botocore.exceptions import NoCredentialsError, ClientError
+from typing import Optional
 from pathlib import Path
 import io
 
@@ -11,22 +12,75 @@ AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
 AWS_S3_BUCKET_NAME = os.getenv("AWS_S3_BUCKET_NAME")
+AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL") or None
 
-# Add error checking for environment variables
-if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, AWS_S3_BUCKET_NAME]):
-    raise ValueError("Missing required AWS credentials in .env file")
+# Connections in the client's pool; bulk transfers run this many requests at once
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
+# Listing of every ingested document, kept up to date by the ingestion workers
+MANIFEST_KEY = "documents/manifest.json"
+
+# Nothing here touches boto3 or the network at import time: the client and transfer
+# config are created on first use, and the bucket check runs from start_s3_health_check
+_s3_client = None
+_transfer_config = None
+_client_lock = threading.Lock()
+_health_check_started = False
+
+def get_s3_client():
+    """Return the shared S3 client, creating it on first use"""
+    global _s3_client
+    if _s3_client is None:
+        with _client_lock:
+            if _s3_client is None:
+                # Add error checking for environment variables
+                if not all([AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_REGION, AWS_S3_BUCKET_NAME]):
+                    raise ValueError("Missing required AWS credentials in .env file")
+                
+                import boto3
+                from botocore.config import Config
+                _s3_client = boto3.client(
+                    "s3",
+                    aws_access_key_id=AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    region_name=AWS_REGION,
+                    # A local S3 stand-in (moto server, MinIO) for tests and benchmarks
+                    endpoint_url=AWS_S3_ENDPOINT_URL,
+                    config=Config(
+                        # Enough connections for every concurrent transfer thread to keep its own
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        retries={"max_attempts": 5, "mode": "adaptive"},
+                        tcp_keepalive=True
+                    )
+                )
+    return _s3_client
+
+def get_object_url(s3_key: str) -> str:
+    """Public URL of an object in the bucket"""
+    return f"https://{AWS_S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+
+def get_transfer_config():
+    """
+    Large PDFs move as concurrent multipart transfers, so memory per transfer is bounded
+    by chunk size x concurrency rather than by file size
+    """
+    global _transfer_config
+    if _transfer_config is None:
+        with _client_lock:
+            if _transfer_config is None:
+                from boto3.s3.transfer import TransferConfig
+                _transfer_config = TransferConfig(
+                    multipart_threshold=int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024))),
+                    multipart_chunksize=int(os.getenv("S3_MULTIPART_CHUNK_SIZE", str(8 * 1024 * 1024))),
+                    max_concurrency=int(os.getenv("S3_TRANSFER_CONCURRENCY", "8")),
+                    use_threads=True
+                )
+    return _transfer_config
 
 def test_s3_connection():
     """Test connection to S3 bucket"""
     try:
-        s3_client.head_bucket(Bucket=AWS_S3_BUCKET_NAME)
+        get_s3_client().head_bucket(Bucket=AWS_S3_BUCKET_NAME)
         return True
     except Exception as e:
         print(f"S3 Connection Error: {str(e)}")
@@ -42,7 +96,7 @@ def ensure_s3_structure():
     
     try:
         for folder in base_folders:
-            s3_client.put_object(
+            get_s3_client().put_object(
                 Bucket=AWS_S3_BUCKET_NAME,
                 Key=folder
             )
@@ -61,7 +115,7 @@ def upload_file_to_s3(file_content: bytes, s3_key: str, content_type: str = None
         if content_type:
             extra_args['ContentType'] = content_type
             
-        s3_client.put_object(
+        get_s3_client().put_object(
             Bucket=AWS_S3_BUCKET_NAME,
             Key=s3_key,
             Body=file_content,
@@ -71,19 +125,20 @@ def upload_file_to_s3(file_content: bytes, s3_key: str, content_type: str = None
     except Exception as e:
         raise Exception(f"Failed to upload file to S3: {e}")
     
-def upload_pdf_to_s3(file_content: bytes, original_filename: str, document_id: str) -> str:
+def upload_pdf_to_s3(pdf_path: str, original_filename: str, document_id: str) -> str:
     """
-    Uploads PDF to S3.
+    Uploads a PDF file from local disk to S3, multipart for large files.
     Returns URL for the uploaded file.
     """
     try:
         # Upload original PDF
         pdf_key = f"documents/pdf/{document_id}/{original_filename}"
-        s3_client.put_object(
-            Bucket=AWS_S3_BUCKET_NAME,
-            Key=pdf_key,
-            Body=file_content,
-            ContentType='application/pdf'
+        get_s3_client().upload_file(
+            pdf_path,
+            AWS_S3_BUCKET_NAME,
+            pdf_key,
+            ExtraArgs={'ContentType': 'application/pdf'},
+            Config=get_transfer_config()
         )
         return f"https://{AWS_S3_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{pdf_key}"
     except Exception as e:
@@ -96,7 +151,7 @@ def upload_markdown_to_s3(markdown_content: str, document_id: str, filename: str
     """
     try:
         markdown_key = f"documents/markdown/{document_id}/{filename}.md"
-        s3_client.put_object(
+        get_s3_client().put_object(
             Bucket=AWS_S3_BUCKET_NAME,
             Key=markdown_key,
             Body=markdown_content.encode('utf-8'),
@@ -106,6 +161,42 @@ def upload_markdown_to_s3(markdown_content: str, document_id: str, filename: str
     except Exception as e:
         raise Exception(f"Failed to upload markdown to S3: {e}")
 
+def upload_staged_pdf_to_s3(fileobj, job_id: str, original_filename: str) -> str:
+    """
+    Streams a PDF waiting for ingestion to the staging area in S3, multipart for large files.
+    Returns the S3 key of the staged file.
+    """
+    try:
+        staged_key = f"documents/uploads/{job_id}/{original_filename}"
+        get_s3_client().upload_fileobj(
+            fileobj,
+            AWS_S3_BUCKET_NAME,
+            staged_key,
+            ExtraArgs={'ContentType': 'application/pdf'},
+            Config=get_transfer_config()
+        )
+        return staged_key
+    except Exception as e:
+        raise Exception(f"Failed to stage PDF in S3: {e}")
+
+def download_staged_pdf_from_s3(staged_key: str, pdf_path: str):
+    """
+    Downloads a staged PDF from S3 to a local file with concurrent ranged reads.
+    """
+    try:
+        get_s3_client().download_file(AWS_S3_BUCKET_NAME, staged_key, pdf_path, Config=get_transfer_config())
+    except Exception as e:
+        raise Exception(f"Failed to get staged PDF from S3: {e}")
+
+def delete_staged_pdf_from_s3(staged_key: str):
+    """
+    Deletes a staged PDF from S3 once it has been ingested.
+    """
+    try:
+        get_s3_client().delete_object(Bucket=AWS_S3_BUCKET_NAME, Key=staged_key)
+    except Exception as e:
+        raise Exception(f"Failed to delete staged PDF from S3: {e}")
+
 def get_pdf_from_s3(document_id: str, filename: str) -> bytes:
     """
     Gets PDF content from S3.
@@ -113,7 +204,7 @@ def get_pdf_from_s3(document_id: str, filename: str) -> bytes:
     """
     try:
         pdf_key = f"documents/pdf/{document_id}/{filename}"
-        response = s3_client.get_object(Bucket=AWS_S3_BUCKET_NAME, Key=pdf_key)
+        response = get_s3_client().get_object(Bucket=AWS_S3_BUCKET_NAME, Key=pdf_key)
         return response['Body'].read()
     except Exception as e:
         raise Exception(f"Failed to get PDF from S3: {e}")
@@ -125,37 +216,136 @@ def get_markdown_from_s3(document_id: str, filename: str) -> str:
     """
     try:
         markdown_key = f"documents/markdown/{document_id}/{filename}.md"
-        response = s3_client.get_object(Bucket=AWS_S3_BUCKET_NAME, Key=markdown_key)
+        response = get_s3_client().get_object(Bucket=AWS_S3_BUCKET_NAME, Key=markdown_key)
         return response['Body'].read().decode('utf-8')
     except Exception as e:
         raise Exception(f"Failed to get markdown from S3: {e}")
 
-def list_documents_from_s3():
+def get_markdown_if_changed_from_s3(document_id: str, filename: str, etag: Optional[str] = None):
     """
-    Lists all documents in S3 bucket.
-    Returns a list of document IDs.
+    Gets markdown content from S3 unless it still matches the given ETag.
+    Returns (content, etag), or None if the object is unchanged.
+    """
+    try:
+        markdown_key = f"documents/markdown/{document_id}/{filename}.md"
+        request = {'Bucket': AWS_S3_BUCKET_NAME, 'Key': markdown_key}
+        if etag:
+            request['IfNoneMatch'] = etag
+        response = get_s3_client().get_object(**request)
+        return response['Body'].read().decode('utf-8'), response['ETag']
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+            return None
+        raise Exception(f"Failed to get markdown from S3: {e}")
+    except Exception as e:
+        raise Exception(f"Failed to get markdown from S3: {e}")
+
+def upload_index_file_to_s3(file_content: bytes, document_id: str, content_hash: str, filename: str) -> str:
+    """
+    Uploads one file of a document's chunk index to S3.
+    Returns the S3 key of the uploaded file.
     """
     try:
-        # List all objects in the PDF directory
-        response = s3_client.list_objects_v2(
+        index_key = f"documents/index/{document_id}/{content_hash}/{filename}"
+        get_s3_client().put_object(
             Bucket=AWS_S3_BUCKET_NAME,
-            Prefix='documents/pdf/',
-            Delimiter='/'
+            Key=index_key,
+            Body=file_content,
+            ContentType='application/octet-stream'
         )
+        return index_key
+    except Exception as e:
+        raise Exception(f"Failed to upload index file to S3: {e}")
+
+def get_index_file_from_s3(document_id: str, content_hash: str, filename: str):
+    """
+    Gets one file of a document's chunk index from S3.
+    Returns the binary content, or None if the index has not been built.
+    """
+    try:
+        index_key = f"documents/index/{document_id}/{content_hash}/{filename}"
+        response = get_s3_client().get_object(Bucket=AWS_S3_BUCKET_NAME, Key=index_key)
+        return response['Body'].read()
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise Exception(f"Failed to get index file from S3: {e}")
+    except Exception as e:
+        raise Exception(f"Failed to get index file from S3: {e}")
+
+def list_documents_page_from_s3(max_keys: int = 1000, continuation_token: Optional[str] = None):
+    """
+    Lists one page of documents in the S3 bucket.
+    Returns (document IDs, continuation token of the next page or None).
+    """
+    try:
+        request = {
+            'Bucket': AWS_S3_BUCKET_NAME,
+            'Prefix': 'documents/pdf/',
+            'Delimiter': '/',
+            'MaxKeys': max_keys
+        }
+        if continuation_token:
+            request['ContinuationToken'] = continuation_token
+        response = get_s3_client().list_objects_v2(**request)
         
         # Extract document IDs from CommonPrefixes
         document_ids = []
-        if 'CommonPrefixes' in response:
-            for prefix in response['CommonPrefixes']:
-                # Extract document ID from prefix
-                prefix_path = prefix['Prefix']
-                document_id = prefix_path.split('/')[-2]  # Format: documents/pdf/{document_id}/
-                document_ids.append(document_id)
-                
-        return document_ids
+        for prefix in response.get('CommonPrefixes', []):
+            # Extract document ID from prefix
+            prefix_path = prefix['Prefix']
+            document_id = prefix_path.split('/')[-2]  # Format: documents/pdf/{document_id}/
+            document_ids.append(document_id)
+        
+        next_token = response.get('NextContinuationToken') if response.get('IsTruncated') else None
+        return document_ids, next_token
     except Exception as e:
         raise Exception(f"Failed to list documents from S3: {e}")
 
+def list_documents_from_s3():
+    """
+    Lists all documents in S3 bucket, following continuation tokens page by page.
+    Returns a list of document IDs.
+    """
+    document_ids = []
+    continuation_token = None
+    while True:
+        page, continuation_token = list_documents_page_from_s3(continuation_token=continuation_token)
+        document_ids.extend(page)
+        if not continuation_token:
+            return document_ids
+
+def upload_manifest_to_s3(manifest_content: bytes) -> str:
+    """
+    Uploads the document manifest to S3.
+    Returns the S3 key of the manifest.
+    """
+    try:
+        get_s3_client().put_object(
+            Bucket=AWS_S3_BUCKET_NAME,
+            Key=MANIFEST_KEY,
+            Body=manifest_content,
+            ContentType='application/json'
+        )
+        return MANIFEST_KEY
+    except Exception as e:
+        raise Exception(f"Failed to upload manifest to S3: {e}")
+
+def get_manifest_from_s3():
+    """
+    Gets the document manifest from S3.
+    Returns the binary content, or None if no manifest has been written yet.
+    """
+    try:
+        response = get_s3_client().get_object(Bucket=AWS_S3_BUCKET_NAME, Key=MANIFEST_KEY)
+        return response['Body'].read()
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise Exception(f"Failed to get manifest from S3: {e}")
+    except Exception as e:
+        raise Exception(f"Failed to get manifest from S3: {e}")
+
 def get_document_metadata(document_id: str):
     """
     Gets metadata for a document from S3.
@@ -163,7 +353,7 @@ def get_document_metadata(document_id: str):
     """
     try:
         # List all objects in the document's PDF directory
-        response = s3_client.list_objects_v2(
+        response = get_s3_client().list_objects_v2(
             Bucket=AWS_S3_BUCKET_NAME,
             Prefix=f'documents/pdf/{document_id}/'
         )
@@ -175,7 +365,7 @@ def get_document_metadata(document_id: str):
             filename = pdf_key.split('/')[-1]
             
             # Get object metadata
-            head_response = s3_client.head_object(
+            head_response = get_s3_client().head_object(
                 Bucket=AWS_S3_BUCKET_NAME,
                 Key=pdf_key
             )
@@ -194,8 +384,20 @@ def get_document_metadata(document_id: str):
     except Exception as e:
         raise Exception(f"Failed to get document metadata from S3: {e}")
 
-# Run this when the module loads to ensure S3 structure exists
-ensure_s3_structure()
+def check_s3_health():
+    """Ensure the S3 structure exists and report whether the bucket is reachable"""
+    try:
+        ensure_s3_structure()
+        if not test_s3_connection():
+            print("WARNING: Cannot access S3 bucket. Please check your credentials and permissions.")
+    except Exception as e:
+        print(f"WARNING: S3 health check failed: {e}")
 
-if not test_s3_connection():
-    print("WARNING: Cannot access S3 bucket. Please check your credentials and permissions.") 
\ No newline at end of file
+def start_s3_health_check():
+    """Run check_s3_health once per process in a background thread; startup does not wait for it"""
+    global _health_check_started
+    with _client_lock:
+        if _health_check_started:
+            return
+        _health_check_started = True
+    threading.Thread(target=check_s3_health, name="s3-health-check", daemon=True).start()
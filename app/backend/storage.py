@@ -0,0 +1,401 @@
+import os
+import glob
+import json
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple, BinaryIO, Iterator
+
+# Default root of the local backend, outside the source checkout; set LOCAL_STORAGE_DIR
+# to app/data/documents to serve the bundled sample documents
+LOCAL_STORAGE_DIR = os.path.join(os.path.expanduser("~"), ".pdf_summarizer", "documents")
+
+
+class StorageBackend:
+    """
+    Where PDFs, markdown, images, staged uploads, chunk indexes and the document
+    manifest are kept. DocumentStore, PDFProcessor and the workers only talk to
+    this interface; get_storage() picks the implementation from STORAGE_BACKEND.
+    """
+
+    name = "base"
+
+    def startup(self):
+        """Called once when a process starts serving; must not block on the network"""
+        pass
+
+    def upload_file(self, file_content: bytes, key: str, content_type: Optional[str] = None) -> str:
+        """Store any file (e.g. an extracted image) under a key; returns its URL"""
+        raise NotImplementedError
+
+    def upload_files(self, items: Dict[str, Tuple[bytes, Optional[str]]]) -> Dict[str, Any]:
+        """
+        Store several files, keyed like upload_file, each with its content type
+
+        Returns:
+            Key to URL, or to the exception of a failed upload
+        """
+        results = {}
+        for key, (file_content, content_type) in items.items():
+            try:
+                results[key] = self.upload_file(file_content, key, content_type=content_type)
+            except Exception as e:
+                results[key] = e
+        return results
+
+    def upload_pdf(self, pdf_path: str, original_filename: str, document_id: str) -> str:
+        """Store a document's original PDF from local disk; returns its URL"""
+        raise NotImplementedError
+
+    def upload_markdown(self, markdown_content: str, document_id: str, filename: str) -> str:
+        """Store a document's markdown; returns its URL"""
+        raise NotImplementedError
+
+    def get_markdown_if_changed(self, document_id: str, filename: str,
+                                etag: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """Return (markdown, etag), or None if the markdown still matches the given ETag"""
+        raise NotImplementedError
+
+    def get_pdf(self, document_id: str, filename: str) -> bytes:
+        raise NotImplementedError
+
+    def stage_upload(self, fileobj: BinaryIO, job_id: str, original_filename: str) -> str:
+        """Stream an uploaded PDF to the staging area; returns its staged key"""
+        raise NotImplementedError
+
+    def download_staged(self, staged_key: str, pdf_path: str):
+        """Copy a staged PDF to a local file"""
+        raise NotImplementedError
+
+    def delete_staged(self, staged_key: str):
+        raise NotImplementedError
+
+    def upload_index_file(self, file_content: bytes, document_id: str, content_hash: str, filename: str) -> str:
+        raise NotImplementedError
+
+    def get_index_file(self, document_id: str, content_hash: str, filename: str) -> Optional[bytes]:
+        """Return one file of a document's chunk index, or None if the index has not been built"""
+        raise NotImplementedError
+
+    def upload_manifest(self, manifest_content: bytes) -> str:
+        raise NotImplementedError
+
+    def get_manifest(self) -> Optional[bytes]:
+        """Return the document manifest, or None if none has been written yet"""
+        raise NotImplementedError
+
+    def list_documents_page(self, limit: int = 1000,
+                            continuation_token: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """One page of stored document IDs and the token of the next page, None after the last"""
+        raise NotImplementedError
+
+    def iter_documents(self, page_size: int = 1000) -> Iterator[List[str]]:
+        """Stream stored document IDs a page at a time"""
+        continuation_token = None
+        while True:
+            document_ids, continuation_token = self.list_documents_page(page_size, continuation_token)
+            if document_ids:
+                yield document_ids
+            if not continuation_token:
+                return
+
+    def list_documents(self) -> List[str]:
+        """IDs of every stored document"""
+        return [document_id for page in self.iter_documents() for document_id in page]
+
+    def get_document_metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of a stored document, or None if it does not exist"""
+        raise NotImplementedError
+
+    def get_documents_metadata(self, document_ids: List[str]) -> Dict[str, Any]:
+        """Metadata of several documents; document ID to metadata, None, or the exception of a failed lookup"""
+        results = {}
+        for document_id in document_ids:
+            try:
+                results[document_id] = self.get_document_metadata(document_id)
+            except Exception as e:
+                results[document_id] = e
+        return results
+
+
+class S3Storage(StorageBackend):
+    """
+    The S3 bucket layout used so far, through s3_utils; batch operations run
+    concurrently on the pooled S3TransferClient
+    """
+
+    name = "s3"
+
+    def __init__(self, transfer=None):
+        from . import s3_utils
+        from .s3_transfer import get_transfer_client
+        self.s3 = s3_utils
+        self.transfer = transfer or get_transfer_client()
+
+    def startup(self):
+        self.s3.start_s3_health_check()
+
+    def upload_file(self, file_content: bytes, key: str, content_type: Optional[str] = None) -> str:
+        return self.s3.upload_file_to_s3(file_content, key, content_type=content_type)
+
+    def upload_files(self, items: Dict[str, Tuple[bytes, Optional[str]]]) -> Dict[str, Any]:
+        results = self.transfer.upload_many(items, ACL="public-read")
+        return {
+            key: result if isinstance(result, Exception) else self.s3.get_object_url(key)
+            for key, result in results.items()
+        }
+
+    def upload_pdf(self, pdf_path: str, original_filename: str, document_id: str) -> str:
+        return self.s3.upload_pdf_to_s3(pdf_path, original_filename, document_id)
+
+    def upload_markdown(self, markdown_content: str, document_id: str, filename: str) -> str:
+        return self.s3.upload_markdown_to_s3(markdown_content, document_id, filename)
+
+    def get_markdown_if_changed(self, document_id: str, filename: str,
+                                etag: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        return self.s3.get_markdown_if_changed_from_s3(document_id, filename, etag)
+
+    def get_pdf(self, document_id: str, filename: str) -> bytes:
+        return self.s3.get_pdf_from_s3(document_id, filename)
+
+    def stage_upload(self, fileobj: BinaryIO, job_id: str, original_filename: str) -> str:
+        return self.s3.upload_staged_pdf_to_s3(fileobj, job_id, original_filename)
+
+    def download_staged(self, staged_key: str, pdf_path: str):
+        self.s3.download_staged_pdf_from_s3(staged_key, pdf_path)
+
+    def delete_staged(self, staged_key: str):
+        self.s3.delete_staged_pdf_from_s3(staged_key)
+
+    def upload_index_file(self, file_content: bytes, document_id: str, content_hash: str, filename: str) -> str:
+        return self.s3.upload_index_file_to_s3(file_content, document_id, content_hash, filename)
+
+    def get_index_file(self, document_id: str, content_hash: str, filename: str) -> Optional[bytes]:
+        return self.s3.get_index_file_from_s3(document_id, content_hash, filename)
+
+    def upload_manifest(self, manifest_content: bytes) -> str:
+        return self.s3.upload_manifest_to_s3(manifest_content)
+
+    def get_manifest(self) -> Optional[bytes]:
+        return self.s3.get_manifest_from_s3()
+
+    def list_documents_page(self, limit: int = 1000,
+                            continuation_token: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        return self.s3.list_documents_page_from_s3(limit, continuation_token)
+
+    def get_document_metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        return self.s3.get_document_metadata(document_id)
+
+    def get_documents_metadata(self, document_ids: List[str]) -> Dict[str, Any]:
+        return self.transfer.map(self.s3.get_document_metadata, document_ids)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Local-filesystem backend following the app/data/documents layout:
+
+        manifest.json                                   document manifest
+        index.json                                      listing of the original app (read only)
+        pdf_sources/{document_id}/raw/{filename}.pdf    original PDF
+        pdf_sources/{document_id}/extracted_markdown/   markdown
+        pdf_sources/{document_id}/extracted_images/     pictures
+        uploads/{job_id}/{filename}.pdf                 staged uploads
+        index/{document_id}/{content_hash}/             chunk indexes
+
+    Documents listed by the original index.json keep the timestamp IDs it gave them,
+    and their folders ({filename}_{timestamp}) are found by that suffix. A folder
+    counts as a document once it holds both the PDF and its markdown.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or os.getenv("LOCAL_STORAGE_DIR", LOCAL_STORAGE_DIR))
+        self.sources_dir = self.root / "pdf_sources"
+        self.manifest_path = self.root / "manifest.json"
+        self.legacy_index_path = self.root / "index.json"
+
+    def _url(self, path: Path) -> str:
+        return path.resolve().as_uri()
+
+    @staticmethod
+    def _filename(name: str) -> str:
+        """The final component of a client-supplied filename, so it cannot point into another folder"""
+        filename = Path(name.replace("\\", "/")).name
+        if filename in ("", ".", ".."):
+            raise ValueError(f"Invalid filename: {name!r}")
+        return filename
+
+    def _path(self, *parts: str) -> Path:
+        """Join parts under the storage root, refusing any path that resolves outside it"""
+        path = self.root.joinpath(*parts)
+        root = self.root.resolve()
+        resolved = path.resolve()
+        if resolved != root and root not in resolved.parents:
+            raise ValueError(f"Path escapes the storage root: {'/'.join(parts)}")
+        return path
+
+    def _document_dir(self, document_id: str) -> Path:
+        """
+        Folder of a document; documents listed by the older index.json are keyed by
+        timestamp alone, so fall back to the folder that ends with it
+        """
+        directory = self._path("pdf_sources", self._filename(document_id))
+        if directory.is_dir() or not self.sources_dir.is_dir():
+            return directory
+        for candidate in self.sources_dir.glob(f"*_{glob.escape(document_id)}"):
+            if candidate.is_dir():
+                return candidate
+        return directory
+
+    def _write(self, path: Path, file_content: bytes):
+        """Write then rename so readers never see a partial file"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        scratch = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        scratch.write_bytes(file_content)
+        os.replace(scratch, path)
+
+    def _read(self, path: Path) -> bytes:
+        return path.read_bytes()
+
+    @staticmethod
+    def _etag(path: Path) -> str:
+        stat = path.stat()
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def upload_file(self, file_content: bytes, key: str, content_type: Optional[str] = None) -> str:
+        # Image keys follow the S3 layout documents/images/{document_id}/{name}
+        parts = Path(key).parts
+        if len(parts) == 4 and parts[:2] == ("documents", "images"):
+            path = self._document_dir(parts[2]) / "extracted_images" / self._filename(parts[3])
+        else:
+            path = self._path(key)
+        self._write(path, file_content)
+        return self._url(path)
+
+    def upload_pdf(self, pdf_path: str, original_filename: str, document_id: str) -> str:
+        path = self._document_dir(document_id) / "raw" / self._filename(original_filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(pdf_path, path)
+        return self._url(path)
+
+    def upload_markdown(self, markdown_content: str, document_id: str, filename: str) -> str:
+        path = self._document_dir(document_id) / "extracted_markdown" / self._filename(f"{filename}.md")
+        self._write(path, markdown_content.encode("utf-8"))
+        return self._url(path)
+
+    def get_markdown_if_changed(self, document_id: str, filename: str,
+                                etag: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        path = self._document_dir(document_id) / "extracted_markdown" / self._filename(f"{filename}.md")
+        try:
+            current_etag = self._etag(path)
+            if etag == current_etag:
+                return None
+            return self._read(path).decode("utf-8"), current_etag
+        except OSError as e:
+            raise Exception(f"Failed to get markdown from local storage: {e}")
+
+    def get_pdf(self, document_id: str, filename: str) -> bytes:
+        try:
+            return self._read(self._document_dir(document_id) / "raw" / self._filename(filename))
+        except OSError as e:
+            raise Exception(f"Failed to get PDF from local storage: {e}")
+
+    def stage_upload(self, fileobj: BinaryIO, job_id: str, original_filename: str) -> str:
+        staged_key = f"uploads/{self._filename(job_id)}/{self._filename(original_filename)}"
+        path = self._path(staged_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as staged:
+            shutil.copyfileobj(fileobj, staged, 1024 * 1024)
+        return staged_key
+
+    def download_staged(self, staged_key: str, pdf_path: str):
+        shutil.copyfile(self._path(staged_key), pdf_path)
+
+    def delete_staged(self, staged_key: str):
+        path = self._path(staged_key)
+        path.unlink(missing_ok=True)
+        try:
+            path.parent.rmdir()
+        except OSError:
+            pass
+
+    def upload_index_file(self, file_content: bytes, document_id: str, content_hash: str, filename: str) -> str:
+        index_key = f"index/{document_id}/{content_hash}/{filename}"
+        self._write(self._path(index_key), file_content)
+        return index_key
+
+    def get_index_file(self, document_id: str, content_hash: str, filename: str) -> Optional[bytes]:
+        path = self._path("index", document_id, content_hash, filename)
+        return self._read(path) if path.exists() else None
+
+    def upload_manifest(self, manifest_content: bytes) -> str:
+        self._write(self.manifest_path, manifest_content)
+        return str(self.manifest_path)
+
+    def get_manifest(self) -> Optional[bytes]:
+        return self._read(self.manifest_path) if self.manifest_path.exists() else None
+
+    def _legacy_ids(self) -> set:
+        """Timestamp IDs of the documents in the original index.json"""
+        try:
+            return {entry["document_id"] for entry in json.loads(self._read(self.legacy_index_path))}
+        except (OSError, ValueError, KeyError, TypeError):
+            return set()
+
+    def list_documents_page(self, limit: int = 1000,
+                            continuation_token: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        # Like S3, pages follow folder name order and the token is the folder the next page starts after
+        if not self.sources_dir.is_dir():
+            return [], None
+        names = sorted(
+            entry.name for entry in os.scandir(self.sources_dir)
+            if entry.is_dir() and (continuation_token is None or entry.name > continuation_token)
+        )
+        legacy_ids = self._legacy_ids()
+        document_ids = []
+        for position, name in enumerate(names):
+            directory = self.sources_dir / name
+            if not (any((directory / "raw").glob("*.pdf")) and any((directory / "extracted_markdown").glob("*.md"))):
+                continue
+            # The same ID _document_dir resolves back to this folder
+            document_ids.append(name[-15:] if name[-15:] in legacy_ids else name)
+            if len(document_ids) == limit:
+                return document_ids, name if position + 1 < len(names) else None
+        return document_ids, None
+
+    def get_document_metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        pdfs = sorted((self._document_dir(document_id) / "raw").glob("*.pdf"))
+        if not pdfs:
+            return None
+        # Document folders end in the processing timestamp; fall back to the file time
+        try:
+            processed = datetime.strptime(pdfs[0].parent.parent.name[-15:], "%Y%m%d_%H%M%S")
+        except ValueError:
+            processed = datetime.fromtimestamp(pdfs[0].stat().st_mtime)
+        return {
+            'document_id': document_id,
+            'original_filename': pdfs[0].name,
+            'processing_date': processed.strftime("%Y-%m-%d %H:%M:%S"),
+            'pdf_url': self._url(pdfs[0])
+        }
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """The process-wide storage backend selected by STORAGE_BACKEND ("s3" or "local")"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            backend = os.getenv("STORAGE_BACKEND", "s3").lower()
+            if backend == "local":
+                _storage = LocalStorage()
+            elif backend == "s3":
+                _storage = S3Storage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+        return _storage
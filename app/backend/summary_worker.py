@@ -3,6 +3,9 @@ import time
 from dotenv import load_dotenv
 from app.backend.redis_service import RedisService
 from app.backend.llm_service import LLMService
+from app.backend.utils import DocumentStore, resolve_document_content
+from app.backend.manifest import DocumentManifest
+from app.backend.result_cache import ChunkSummaryStore
 
 # Load environment variables
 load_dotenv()
@@ -11,32 +14,46 @@ def process_summary_request(data):
     """Process a summary request from Redis stream"""
     print(f"Processing summary request: {data['request_id']}")
     
-    # Initialize LLM service
-    llm_service = LLMService()
+    # Resolve the document the request refers to
+    content = resolve_document_content(redis_service, document_store, data)
+    if content is None:
+        print(f"Document {data['document_id']} not found for request {data['request_id']}")
+        redis_service.publish_summary_response(data["request_id"], "Unable to generate summary: document not found.", {}, error=True)
+        return
     
     # Get model ID from request (default to Zephyr if not specified)
     model_id = data.get("model_id", "huggingface/HuggingFaceH4/zephyr-7b-beta")
     
     # Generate summary
-    summary, cost_info = llm_service.generate_summary(data["content"], model_id)
+    summary, cost_info, failed = llm_service.generate_summary(content, model_id, chunk_store=chunk_store)
     
     # Publish response back to Redis
     redis_service.publish_summary_response(
         data["request_id"],
         summary,
-        cost_info
+        cost_info,
+        error=failed
     )
     
     print(f"Summary request {data['request_id']} processed")
 
 if __name__ == "__main__":
-    # Initialize Redis service
+    # Initialize Redis service and the store used when cached content has expired
     redis_service = RedisService()
+    document_store = DocumentStore(DocumentManifest(redis_service.redis_client))
+    document_store.storage.startup()
+    
+    # One LLM service per process so the tokenizer and HTTP connection pools are reused
+    llm_service = LLMService()
+    
+    # Chunk summaries shared by every summary worker, so only new chunks are sent to the model
+    chunk_store = ChunkSummaryStore(redis_service.redis_client)
     
     # Generate a unique consumer name
     consumer_name = f"summary_worker_{os.getpid()}"
     
-    print(f"Starting summary worker with consumer name: {consumer_name}")
+    print(f"Starting summary worker with consumer name: {consumer_name} "
+          f"(max in flight: {redis_service.worker_max_in_flight})")
     
     # Start consuming summary requests
     redis_service.consume_summary_requests(consumer_name, process_summary_request)
\ No newline at end of file
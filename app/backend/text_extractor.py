@@ -0,0 +1,153 @@
+import os
+import re
+from typing import Dict, Any, List
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+# A page with fewer extractable characters than this is treated as scanned
+TEXT_LAYER_MIN_CHARS = int(os.getenv("PDF_TEXT_LAYER_MIN_CHARS", "50"))
+
+# The fast path needs this many characters per page on average
+FAST_PATH_MIN_CHARS_PER_PAGE = int(os.getenv("PDF_FAST_PATH_MIN_CHARS_PER_PAGE", "500"))
+
+# A page with this many table-like rows, or this many vector paths (ruling lines, cell borders), has a table
+FAST_PATH_MAX_TABLE_ROWS = int(os.getenv("PDF_FAST_PATH_MAX_TABLE_ROWS", "4"))
+FAST_PATH_MAX_PATHS = int(os.getenv("PDF_FAST_PATH_MAX_PATHS", "40"))
+
+# A row of a financial or numeric table: three or more separate numbers on one line
+NUMBER_PATTERN = re.compile(r"(?<![\w.])[$(]?-?\d[\d,]*(?:\.\d+)?%?\)?(?![\w.])")
+BULLET_PATTERN = re.compile(r"^[•●▪◦‣∙·\-–*]\s*")
+
+
+def _page_text(page) -> str:
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_bounded()
+    finally:
+        textpage.close()
+
+
+def _count_paths(page) -> int:
+    return sum(1 for _ in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH], max_depth=1))
+
+
+def _table_rows(text: str) -> int:
+    return sum(1 for line in text.splitlines() if len(NUMBER_PATTERN.findall(line)) >= 3)
+
+
+def scan_pdf(pdf_path: str) -> List[Dict[str, Any]]:
+    """
+    Read every page's text layer in one pass over the PDF
+
+    The scan is shared by text-layer detection, the fast-path assessment and fast
+    extraction, so a PDF is opened and its text extracted only once.
+
+    Args:
+        pdf_path: Path of the PDF on local disk
+
+    Returns:
+        One dict per page: its text, whether it has a text layer ("text_layer") and
+        whether it looks like it holds a table ("table")
+    """
+    document = pdfium.PdfDocument(pdf_path)
+    try:
+        pages = []
+        for index in range(len(document)):
+            page = document[index]
+            try:
+                text = _page_text(page).replace("\r\n", "\n").replace("\r", "\n")
+                pages.append({
+                    "text": text,
+                    "text_layer": len(text.strip()) >= TEXT_LAYER_MIN_CHARS,
+                    "table": _table_rows(text) >= FAST_PATH_MAX_TABLE_ROWS or _count_paths(page) >= FAST_PATH_MAX_PATHS
+                })
+            finally:
+                page.close()
+        return pages
+    finally:
+        document.close()
+
+
+def assess_pdf(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Decide whether a PDF is simple enough for the fast text extractor
+
+    A PDF qualifies when every page has a text layer, the text is dense enough to be
+    prose rather than a form or slide deck, and no page looks like it holds a table.
+
+    Args:
+        pages: The scan_pdf result
+
+    Returns:
+        Dict with the page count, "fast_path" flag and the reason for the decision
+    """
+    page_count = len(pages)
+    for index, page in enumerate(pages):
+        if not page["text_layer"]:
+            return {"page_count": page_count, "fast_path": False, "reason": f"page {index + 1} has no text layer"}
+        if page["table"]:
+            return {"page_count": page_count, "fast_path": False, "reason": f"page {index + 1} has a table"}
+
+    total_chars = sum(len(page["text"].strip()) for page in pages)
+    if page_count == 0 or total_chars / page_count < FAST_PATH_MIN_CHARS_PER_PAGE:
+        return {"page_count": page_count, "fast_path": False, "reason": "text density too low"}
+    return {"page_count": page_count, "fast_path": True, "reason": "simple born-digital text"}
+
+
+def _lines_to_markdown(lines: List[str]) -> List[str]:
+    """
+    Rejoin wrapped lines into paragraphs and turn bullet glyphs into markdown list items
+
+    A line that stops well short of the page's text width ends its paragraph, which is
+    how the text layer marks paragraph and heading breaks without any layout analysis.
+    """
+    lines = [line.strip() for line in lines]
+    width = max((len(line) for line in lines), default=0)
+    blocks = []
+    paragraph = ""
+    for line in lines:
+        if not line:
+            if paragraph:
+                blocks.append(paragraph)
+                paragraph = ""
+            continue
+
+        if BULLET_PATTERN.match(line):
+            if paragraph:
+                blocks.append(paragraph)
+            paragraph = "- " + BULLET_PATTERN.sub("", line)
+        elif paragraph.endswith("-") and not paragraph.endswith(" -"):
+            # Word hyphenated across a line break
+            paragraph = paragraph[:-1] + line
+        elif paragraph:
+            paragraph = f"{paragraph} {line}"
+        else:
+            paragraph = line
+
+        if len(line) < width * 0.75:
+            blocks.append(paragraph)
+            paragraph = ""
+
+    if paragraph:
+        blocks.append(paragraph)
+    return blocks
+
+
+def extract_markdown(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Turn the text layer read by scan_pdf into lightweight markdown
+
+    Args:
+        pages: The scan_pdf result
+
+    Returns:
+        Dict shaped like a Docling conversion: markdown, raw text and (no) images
+    """
+    page_texts = [page["text"] for page in pages]
+    markdown_pages = ["\n\n".join(_lines_to_markdown(text.split("\n"))) for text in page_texts]
+    return {
+        "markdown": "\n\n".join(page for page in markdown_pages if page),
+        "raw_text": "\n\n".join(text.strip() for text in page_texts if text.strip()),
+        "images": []
+    }
@@ -1,17 +1,48 @@
 import os
 import json
+import asyncio
+import hashlib
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from .models import Document, DocumentResponse
-from .s3_utils import list_documents_from_s3, get_document_metadata, get_markdown_from_s3
+from .storage import StorageBackend, get_storage
+from .manifest import DocumentManifest
+from .content_cache import DocumentContentCache
+
+def compute_content_hash(content: str) -> str:
+    """Return the SHA-256 hex digest used to address a document's markdown"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def compute_file_hash(fileobj, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 hex digest of a file object, reading it in fixed-size chunks
+    The file is rewound afterwards so it can be read again
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
 
 class DocumentStore:
-    def __init__(self):
+    def __init__(self, manifest: Optional[DocumentManifest] = None,
+                 content_cache: Optional[DocumentContentCache] = None,
+                 storage: Optional[StorageBackend] = None):
         """
         Initialize the document store
-        No need for documents_dir as we're using S3 storage
+        Files live in the storage backend (S3 or local disk, see get_storage)
+        
+        Args:
+            manifest: Document manifest used for listing and metadata lookups
+            content_cache: Memory and local-disk cache in front of the stored markdown
+            storage: Storage backend; get_storage() by default
         """
-        pass
+        self.storage = storage or get_storage()
+        self.manifest = manifest or DocumentManifest(storage=self.storage)
+        self.content_cache = content_cache or DocumentContentCache(storage=self.storage)
     
     def add_document(self, metadata: Dict[str, Any], content: str) -> str:
         """
@@ -34,7 +65,12 @@ class DocumentStore:
         )
         
         # Document is already stored in S3 by the PDF processor
-        # Just return the document ID
+        # Just list it in the manifest, with the markdown version caches validate against,
+        # and return the document ID. Every ingest mints a new document ID and cached
+        # copies are checked against markdown_sha256, so there is nothing to invalidate
+        entry = DocumentManifest.entry_from_metadata(metadata)
+        entry["markdown_sha256"] = compute_content_hash(content)
+        self.manifest.add(entry)
         return document.document_id
     
     def get_document_content(self, document_id: str) -> Optional[Dict[str, Any]]:
@@ -48,14 +84,14 @@ class DocumentStore:
             Document content and metadata
         """
         try:
-            # Get document metadata from S3
-            metadata = get_document_metadata(document_id)
+            # Get document metadata from the manifest
+            metadata = self.get_document_metadata(document_id)
             if not metadata:
                 return None
             
-            # Get document content from S3
+            # Get document content through the cache, which only goes to S3 when its copy is stale
             filename = Path(metadata['original_filename']).stem
-            content = get_markdown_from_s3(document_id, filename)
+            content = self.content_cache.get(document_id, filename, metadata.get('markdown_sha256'))
             
             return {
                 "document_id": document_id,
@@ -66,6 +102,44 @@ class DocumentStore:
             print(f"Error getting document content: {str(e)}")
             return None
     
+    def stage_upload(self, fileobj, job_id: str, original_filename: str) -> str:
+        """
+        Stream an uploaded PDF to where the ingestion workers can pick it up
+        
+        Args:
+            fileobj: Readable binary file object positioned at the start of the PDF
+            job_id: The ingestion job ID
+            original_filename: The original filename of the PDF
+            
+        Returns:
+            Storage key of the staged file
+        """
+        return self.storage.stage_upload(fileobj, job_id, original_filename)
+    
+    def get_document_metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get document metadata by ID without downloading its content
+        
+        Args:
+            document_id: Document ID
+            
+        Returns:
+            Document metadata, or None if the document does not exist
+        """
+        try:
+            metadata = self.manifest.get(document_id)
+            if metadata:
+                return metadata
+            
+            # Not in the manifest (e.g. stored before it existed): look it up in storage and list it
+            metadata = self.storage.get_document_metadata(document_id)
+            if metadata:
+                self.manifest.add(metadata)
+            return metadata
+        except Exception as e:
+            print(f"Error getting document metadata: {str(e)}")
+            return None
+    
     def get_documents(self) -> List[Dict[str, Any]]:
         """
         Get all documents in the store
@@ -74,17 +148,94 @@ class DocumentStore:
             List of document metadata
         """
         try:
-            # Get list of document IDs from S3
-            document_ids = list_documents_from_s3()
+            # A single read of the manifest rather than an S3 listing plus a lookup per document
+            return self.manifest.list()
+        except Exception as e:
+            print(f"Error getting documents: {str(e)}")
+            return []
+    
+    def get_documents_page(self, limit: int, cursor: Optional[str] = None, sort: str = "date",
+                           order: str = "desc", name: Optional[str] = None, date_from: Optional[str] = None,
+                           date_to: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get one page of the documents in the store
+        
+        Args:
+            limit: Maximum number of documents on the page
+            cursor: Cursor of the page to read, from the previous page; None for the first page
+            sort, order, name, date_from, date_to: Ordering and filters, see DocumentManifest.page
             
-            # Get metadata for each document
-            documents = []
-            for doc_id in document_ids:
-                metadata = get_document_metadata(doc_id)
-                if metadata:
-                    documents.append(metadata)
+        Returns:
+            List of document metadata and the cursor of the next page, or None after the last page
             
-            return documents
+        Raises:
+            ValueError: For an invalid cursor or combination of sort and filters
+        """
+        try:
+            return self.manifest.page(
+                limit, cursor=cursor, sort=sort, order=order,
+                name=name, date_from=date_from, date_to=date_to
+            )
+        except ValueError:
+            raise
         except Exception as e:
             print(f"Error getting documents: {str(e)}")
-            return [] 
\ No newline at end of file
+            return [], None
+
+
+class AsyncDocumentStore:
+    """
+    Awaitable facade over DocumentStore for the async API handlers
+    The boto3 calls behind DocumentStore block, so they run in worker threads
+    """
+    
+    def __init__(self, document_store: Optional[DocumentStore] = None):
+        self.document_store = document_store or DocumentStore()
+    
+    async def add_document(self, metadata: Dict[str, Any], content: str) -> str:
+        return await asyncio.to_thread(self.document_store.add_document, metadata, content)
+    
+    async def get_document_content(self, document_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.document_store.get_document_content, document_id)
+    
+    async def stage_upload(self, fileobj, job_id: str, original_filename: str) -> str:
+        return await asyncio.to_thread(self.document_store.stage_upload, fileobj, job_id, original_filename)
+    
+    async def get_document_metadata(self, document_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.document_store.get_document_metadata, document_id)
+    
+    async def get_documents(self) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.document_store.get_documents)
+    
+    async def get_documents_page(self, limit: int, cursor: Optional[str] = None,
+                                 **filters) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return await asyncio.to_thread(self.document_store.get_documents_page, limit, cursor, **filters)
+
+
+def resolve_document_content(redis_service, document_store: DocumentStore, data: Dict[str, Any]) -> Optional[str]:
+    """
+    Resolve the markdown a stream request refers to
+    
+    Args:
+        redis_service: RedisService holding the content-addressed cache
+        document_store: Document store used when the cached copy has expired
+        data: The stream message with document_id and content_hash
+        
+    Returns:
+        The document markdown, or None if the document no longer exists
+    """
+    # Messages published before requests carried references still inline the content
+    if "content" in data:
+        return data["content"]
+    
+    content = redis_service.get_cached_document_content(data["content_hash"])
+    if content is not None:
+        return content
+    
+    document_data = document_store.get_document_content(data["document_id"])
+    if not document_data:
+        return None
+    
+    content = document_data["content"]
+    redis_service.cache_document_content(compute_content_hash(content), content)
+    return content
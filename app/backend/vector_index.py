@@ -0,0 +1,320 @@
+import os
+import json
+import mmap
+import time
+import hashlib
+import shutil
+import uuid
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Tuple, Optional, Callable
+
+import numpy as np
+
+from .retrieval import tokenize
+from .storage import StorageBackend, get_storage
+
+INDEX_FILES = ["meta.json", "embeddings.npy", "scales.npy", "offsets.npy", "chunks.bin"]
+
+
+class HashingEmbedder:
+    """
+    Deterministic, offline embedder based on the hashing trick
+    Unigrams and bigrams are hashed into a fixed number of signed buckets, so the
+    same text always gets the same vector in every process without any model download
+    """
+    
+    name = "hashing"
+    
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+    
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, (1.0 if value >> 63 else -1.0)
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed the texts as rows of an L2-normalized float32 matrix"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                bucket, sign = self._bucket(feature)
+                matrix[row, bucket] += sign
+        
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+def get_embedder():
+    """Return the embedder selected by EMBEDDING_BACKEND"""
+    backend = os.getenv("EMBEDDING_BACKEND", "hashing")
+    if backend == "hashing":
+        return HashingEmbedder(dim=int(os.getenv("EMBEDDING_DIM", "384")))
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+class ChunkVectorIndex:
+    """
+    Dense index over one document's chunks
+    Embeddings are one contiguous matrix (float32, or int8 with per-row scales) and the
+    chunk texts one UTF-8 blob addressed by offsets, so both can be memory-mapped
+    """
+    
+    def __init__(self, embeddings: np.ndarray, scales: Optional[np.ndarray], offsets: np.ndarray,
+                 chunk_data, embedder, meta: dict):
+        self.embeddings = embeddings
+        self.scales = scales
+        self.offsets = offsets
+        self.chunk_data = chunk_data
+        self.embedder = embedder
+        self.meta = meta
+    
+    @property
+    def chunk_count(self) -> int:
+        return len(self.offsets) - 1
+    
+    @property
+    def token_count(self) -> int:
+        return self.meta["token_count"]
+    
+    @classmethod
+    def build(cls, chunks: List[str], embedder, content_hash: str, token_count: int,
+              quantize: bool = False) -> "ChunkVectorIndex":
+        """
+        Embed the chunks and build an in-memory index
+        
+        Args:
+            chunks: The document chunks, in document order
+            embedder: Embedder used for the chunks and, later, for queries
+            content_hash: Hash of the document content the chunks came from
+            token_count: Token count of the whole document
+            quantize: Store int8 embeddings with per-row scales instead of float32
+        """
+        embeddings = embedder.embed(chunks)
+        scales = None
+        if quantize:
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            embeddings = np.round(embeddings / scales[:, None]).astype(np.int8)
+            scales = scales.astype(np.float32)
+        
+        encoded = [chunk.encode("utf-8") for chunk in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(chunk) for chunk in encoded])
+        
+        meta = {
+            "content_hash": content_hash,
+            "token_count": token_count,
+            "embedder": embedder.name,
+            "dim": int(embeddings.shape[1]),
+            "quantized": quantize,
+        }
+        return cls(embeddings, scales, offsets, b"".join(encoded), embedder, meta)
+    
+    def save(self, directory: Path):
+        """Write the index files into the directory"""
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "embeddings.npy", np.ascontiguousarray(self.embeddings))
+        np.save(directory / "scales.npy", self.scales if self.scales is not None else np.ones(0, dtype=np.float32))
+        np.save(directory / "offsets.npy", self.offsets)
+        (directory / "chunks.bin").write_bytes(bytes(self.chunk_data))
+        # meta.json goes last so a half-written directory is never picked up
+        (directory / "meta.json").write_text(json.dumps(self.meta))
+    
+    @classmethod
+    def load(cls, directory: Path, embedder) -> "ChunkVectorIndex":
+        """Memory-map an index written by save()"""
+        meta = json.loads((directory / "meta.json").read_text())
+        embeddings = np.load(directory / "embeddings.npy", mmap_mode="r")
+        scales = np.load(directory / "scales.npy") if meta["quantized"] else None
+        offsets = np.load(directory / "offsets.npy")
+        
+        with open(directory / "chunks.bin", "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            chunk_data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        
+        return cls(embeddings, scales, offsets, chunk_data, embedder, meta)
+    
+    def get_chunk(self, index: int) -> str:
+        """Read one chunk's text without touching the rest"""
+        return bytes(self.chunk_data[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+    
+    def full_text(self) -> str:
+        """Rebuild the whole document text (chunks were split on blank lines)"""
+        return "\n\n".join(self.get_chunk(i) for i in range(self.chunk_count))
+    
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Rank chunks by cosine similarity to the query
+        
+        Returns:
+            (chunk index, score) pairs, best first
+        """
+        query_vector = self.embedder.embed([query])[0]
+        scores = self.embeddings @ query_vector
+        if self.scales is not None:
+            scores = scores * self.scales
+        
+        top_k = min(top_k, self.chunk_count)
+        if top_k <= 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+
+class VectorIndexStore:
+    """
+    Finds or builds the chunk index of a document
+    Indexes are persisted next to the document in storage and cached on local disk, where
+    they are memory-mapped; recently used ones stay open in a small LRU. Each embedder
+    and dimension gets its own subdirectory, so changing either builds a new index
+    instead of loading vectors of the wrong shape
+    """
+    
+    def __init__(self, embedder=None, cache_dir: Optional[str] = None, max_open: int = 64,
+                 storage: Optional[StorageBackend] = None):
+        self.embedder = embedder or get_embedder()
+        self.storage = storage or get_storage()
+        self.cache_dir = Path(cache_dir or os.getenv(
+            "VECTOR_INDEX_DIR", os.path.join(tempfile.gettempdir(), "pdf_vector_index")
+        ))
+        self.quantize = os.getenv("VECTOR_INDEX_QUANTIZE", "false").lower() == "true"
+        self.max_open = max_open
+        self._open_indexes = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def variant(self) -> str:
+        """Subdirectory of the indexes built by this store's embedder"""
+        return f"{self.embedder.name}-{self.embedder.dim}"
+    
+    def _local_dir(self, document_id: str, content_hash: str) -> Path:
+        return self.cache_dir / document_id / content_hash / self.variant
+    
+    def _compatible(self, meta: dict) -> bool:
+        return meta.get("embedder") == self.embedder.name and meta.get("dim") == self.embedder.dim
+    
+    def _install(self, scratch: Path, directory: Path):
+        """
+        Move a fully written scratch directory into place
+        An incompatible directory already there is replaced; a compatible one means
+        another thread got there first, and the scratch copy is dropped
+        """
+        try:
+            os.rename(scratch, directory)
+            return
+        except OSError:
+            pass
+        try:
+            current = json.loads((directory / "meta.json").read_text())
+        except (OSError, ValueError):
+            current = {}
+        if self._compatible(current):
+            shutil.rmtree(scratch, ignore_errors=True)
+            return
+        shutil.rmtree(directory, ignore_errors=True)
+        try:
+            os.rename(scratch, directory)
+        except OSError:
+            shutil.rmtree(scratch, ignore_errors=True)
+    
+    def _remember(self, key: Tuple[str, str], index: ChunkVectorIndex):
+        with self._lock:
+            self._open_indexes[key] = index
+            self._open_indexes.move_to_end(key)
+            while len(self._open_indexes) > self.max_open:
+                self._open_indexes.popitem(last=False)
+    
+    def get(self, document_id: str, content_hash: str) -> Optional[ChunkVectorIndex]:
+        """
+        Load the index from the open LRU, local disk or storage, in that order
+        Returns None if the document has not been indexed yet
+        """
+        key = (document_id, content_hash)
+        with self._lock:
+            index = self._open_indexes.get(key)
+            if index is not None:
+                self._open_indexes.move_to_end(key)
+                return index
+        
+        directory = self._local_dir(document_id, content_hash)
+        if not (directory / "meta.json").exists():
+            if not self._download(document_id, content_hash, directory):
+                return None
+        
+        index = ChunkVectorIndex.load(directory, self.embedder)
+        if not self._compatible(index.meta):
+            return None
+        
+        self._remember(key, index)
+        return index
+    
+    def _download(self, document_id: str, content_hash: str, directory: Path) -> bool:
+        """Copy a persisted index from storage to local disk"""
+        files = {}
+        for filename in INDEX_FILES:
+            file_content = self.storage.get_index_file(document_id, content_hash, f"{self.variant}/{filename}")
+            if file_content is None:
+                return False
+            files[filename] = file_content
+        
+        # Same scratch-and-rename as build(), so a reader never maps a half-copied index
+        scratch = directory.with_name(f"{directory.name}.{uuid.uuid4().hex}.tmp")
+        scratch.mkdir(parents=True)
+        for filename in INDEX_FILES:
+            if filename != "meta.json":
+                (scratch / filename).write_bytes(files[filename])
+        (scratch / "meta.json").write_bytes(files["meta.json"])
+        self._install(scratch, directory)
+        return True
+    
+    def build(self, document_id: str, content_hash: str, chunks: List[str], token_count: int) -> ChunkVectorIndex:
+        """Build an index, persist it locally and to storage, and return the memory-mapped copy"""
+        start = time.perf_counter()
+        index = ChunkVectorIndex.build(chunks, self.embedder, content_hash, token_count, quantize=self.quantize)
+        
+        # Write to a scratch directory and rename, so concurrent builds never interleave files
+        directory = self._local_dir(document_id, content_hash)
+        scratch = directory.with_name(f"{directory.name}.{uuid.uuid4().hex}.tmp")
+        index.save(scratch)
+        self._install(scratch, directory)
+        
+        for filename in INDEX_FILES:
+            self.storage.upload_index_file(
+                (directory / filename).read_bytes(), document_id, content_hash, f"{self.variant}/{filename}"
+            )
+        
+        print(f"Built vector index for {document_id} ({len(chunks)} chunks) in {(time.perf_counter() - start) * 1000:.1f} ms")
+        
+        index = ChunkVectorIndex.load(directory, self.embedder)
+        self._remember((document_id, content_hash), index)
+        return index
+    
+    def get_or_build(self, document_id: str, content_hash: str,
+                     load_content: Callable[[], Optional[str]], chunker: Callable[[str], List[str]],
+                     count_tokens: Callable[[str], int]) -> Optional[ChunkVectorIndex]:
+        """
+        Return the document's index, building it from its content on first use
+        
+        Args:
+            document_id: The document ID
+            content_hash: Hash of the document content
+            load_content: Loads the document markdown; only called when building
+            chunker: Splits the markdown into chunks
+            count_tokens: Counts tokens of the whole document
+        """
+        index = self.get(document_id, content_hash)
+        if index is not None:
+            return index
+        
+        content = load_content()
+        if content is None:
+            return None
+        return self.build(document_id, content_hash, chunker(content), count_tokens(content))
@@ -5,6 +5,8 @@ import streamlit as st
 
 # API configuration
 API_URL = "http://34.21.27.229:8000/"
+# Documents fetched per page of the listing
+DOCUMENTS_PAGE_SIZE = 20
 
 # Set page configuration
 st.set_page_config(
@@ -79,6 +81,11 @@ if "answer" not in st.session_state:
     st.session_state.answer = None
 if "cost_info" not in st.session_state:
     st.session_state.cost_info = None
+# Pages of the document listing loaded so far, and the query they belong to
+if "documents" not in st.session_state:
+    st.session_state.documents = None
+    st.session_state.documents_cursor = None
+    st.session_state.documents_query = None
 if "selected_model" not in st.session_state:
     st.session_state.selected_model = "huggingface/HuggingFaceH4/zephyr-7b-beta"
 if "models" not in st.session_state:
@@ -93,18 +100,29 @@ if "models" not in st.session_state:
         st.session_state.models = []
 
 # Helper functions
-def get_documents():
-    """Get list of processed documents from API"""
+def get_documents(cursor=None, sort="date", name=None):
+    """Get a page of processed documents from API, with the cursor of the next page"""
+    params = {"limit": DOCUMENTS_PAGE_SIZE, "sort": sort, "order": "desc" if sort == "date" else "asc"}
+    if cursor:
+        params["cursor"] = cursor
+    if name:
+        params["name"] = name
     try:
-        response = requests.get(f"{API_URL}/documents")
+        response = requests.get(f"{API_URL}/documents", params=params)
         if response.status_code == 200:
-            return response.json()["documents"]
+            result = response.json()
+            return result["documents"], result.get("next_cursor")
         else:
             st.error(f"Error fetching documents: {response.text}")
-            return []
+            return [], None
     except Exception as e:
         st.error(f"Error connecting to API: {str(e)}")
-        return []
+        return [], None
+
+def reset_documents():
+    """Drop the loaded document pages so the listing is fetched again"""
+    st.session_state.documents = None
+    st.session_state.documents_cursor = None
 
 def get_document_content(document_id):
     """Get content of a specific document from API"""
@@ -119,11 +137,11 @@ def get_document_content(document_id):
         st.error(f"Error connecting to API: {str(e)}")
         return None
 
-def upload_pdf(file):
+def upload_pdf(file, profile):
     """Upload PDF file to API"""
     try:
         files = {"file": (file.name, file.getvalue(), "application/pdf")}
-        response = requests.post(f"{API_URL}/upload_pdf", files=files)
+        response = requests.post(f"{API_URL}/upload_pdf", files=files, data={"profile": profile})
         if response.status_code == 200:
             return response.json()
         else:
@@ -133,6 +151,31 @@ def upload_pdf(file):
         st.error(f"Error connecting to API: {str(e)}")
         return None
 
+def get_ingest_job(job_id):
+    """Get the status of an ingestion job from API"""
+    try:
+        response = requests.get(f"{API_URL}/ingest_jobs/{job_id}")
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except Exception as e:
+        st.error(f"Error connecting to API: {str(e)}")
+        return None
+
+def wait_for_ingest_job(job_id, timeout=600, poll_interval=1.0):
+    """Poll an ingestion job until it finishes, showing the current stage"""
+    status = st.empty()
+    deadline = time.time() + timeout
+    job = None
+    while time.time() < deadline:
+        job = get_ingest_job(job_id)
+        if not job or job['status'] in ('completed', 'failed'):
+            break
+        status.caption(f"Stage: {job['stage']}")
+        time.sleep(poll_interval)
+    status.empty()
+    return job
+
 def generate_summary(document_id, model_id):
     """Generate summary for a document"""
     try:
@@ -228,22 +271,51 @@ with st.sidebar:
     uploaded_file = st.file_uploader("Upload a PDF document", type=["pdf"])
     
     if uploaded_file:
+        profile = st.selectbox(
+            "Processing profile",
+            ["balanced", "fast", "accurate"],
+            help="fast skips table structure, accurate OCRs every page; all profiles OCR scanned pages"
+        )
         if st.button("Process PDF"):
             with st.spinner("Processing PDF..."):
-                result = upload_pdf(uploaded_file)
-                if result:
-                    st.success(f"PDF uploaded successfully: {result['original_filename']}")
-                    # Refresh document list
-                    time.sleep(2)  # Wait for processing to complete
+                result = upload_pdf(uploaded_file, profile)
+                if result and result.get('deduplicated'):
+                    st.success(f"This PDF was already processed as {result['original_filename']}")
+                elif result:
+                    job = wait_for_ingest_job(result['job_id'])
+                    if job and job['status'] == 'completed':
+                        reset_documents()
+                        st.success(f"PDF processed successfully: {job['original_filename']}")
+                    elif job and job['status'] == 'failed':
+                        st.error(f"Processing failed: {job.get('error')}")
+                    elif job:
+                        st.info(f"{job['original_filename']} is still being processed (stage: {job['stage']}). It will appear below when ready.")
     
     st.markdown("---")
     
     # Select from existing documents
     st.subheader("Select Existing Document")
-    documents = get_documents()
+    name_filter = st.text_input("Search by filename", placeholder="Filename starts with...").strip()
+    sort = "name" if name_filter else st.radio(
+        "Sort by", ["date", "name"], horizontal=True,
+        format_func=lambda option: "Newest first" if option == "date" else "Filename"
+    )
+    
+    # Pages are fetched on demand and kept across reruns until the query changes
+    query = (sort, name_filter)
+    if st.session_state.documents is None or st.session_state.documents_query != query:
+        st.session_state.documents_query = query
+        st.session_state.documents, st.session_state.documents_cursor = get_documents(sort=sort, name=name_filter)
+    documents = st.session_state.documents
     
     if not documents:
-        st.info("No processed documents found. Upload a PDF to get started.")
+        if name_filter:
+            st.info("No documents match this search.")
+        else:
+            st.info("No processed documents found. Upload a PDF to get started.")
+        if st.button("Refresh list"):
+            reset_documents()
+            st.rerun()
     else:
         # Create document selection
         for doc in documents:
@@ -264,6 +336,19 @@ with st.sidebar:
                         st.session_state.answer = None
                         st.session_state.cost_info = None
                         st.rerun()
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.session_state.documents_cursor and st.button("Load more"):
+                page, st.session_state.documents_cursor = get_documents(
+                    st.session_state.documents_cursor, sort=sort, name=name_filter
+                )
+                st.session_state.documents.extend(page)
+                st.rerun()
+        with col2:
+            if st.button("Refresh list"):
+                reset_documents()
+                st.rerun()
 
 # Main content
 st.title("PDF Summarizer and Q&A")
@@ -314,6 +399,8 @@ if st.session_state.selected_document and st.session_state.document_content:
                 if answer_result:
                     st.session_state.answer = answer_result['answer']
                     st.session_state.cost_info = answer_result['cost']
+                    if answer_result.get('cached'):
+                        st.caption("Answer reused from an earlier, similar question")
         
         if st.session_state.answer:
             st.subheader("Answer")
@@ -0,0 +1,62 @@
+"""
+Docling cold-start benchmark
+
+Measures what an ingestion worker pays before its first job completes: importing
+Docling, constructing PDFProcessor, preloading the models and the first
+conversion. The first conversion is timed twice, in fresh processes, once after
+preloading and once without, so the run shows how much of the model loading
+preload moves out of the first job. convert_pdf is called directly, so the
+Docling path is always the one timed. Nothing is uploaded to S3.
+
+    python -m benchmarks.bench_cold_start
+
+APP_RELEASE tags the output so numbers can be compared between releases, and
+BENCH_PDF overrides the PDF converted (default: the bundled AMZN sample).
+"""
+import glob
+import json
+import multiprocessing
+import os
+import time
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "data", "documents", "pdf_sources")
+
+
+def sample_pdf() -> str:
+    return os.getenv("BENCH_PDF") or sorted(glob.glob(os.path.join(SAMPLES_DIR, "AMZN*", "raw", "*.pdf")))[0]
+
+
+def cold_start(preload: bool, results):
+    """Run in a fresh process so no model is already in memory"""
+    started = time.perf_counter()
+    from app.backend.pdf_processor import PDFProcessor, DEFAULT_PIPELINE_PROFILE
+    timings = {"import": round(time.perf_counter() - started, 3)}
+
+    processor = PDFProcessor()
+    if preload:
+        processor.preload()
+    timings.update(processor.timings)
+    converted = time.perf_counter()
+    processor.convert_pdf(sample_pdf(), DEFAULT_PIPELINE_PROFILE)
+    timings["first_conversion"] = round(time.perf_counter() - converted, 3)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    results[preload] = timings
+
+
+def main():
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.dict()
+        for preload in (True, False):
+            process = context.Process(target=cold_start, args=(preload, results))
+            process.start()
+            process.join()
+        results = dict(results)
+
+    print(f"release: {os.getenv('APP_RELEASE', 'unknown')}, pdf: {os.path.basename(sample_pdf())}")
+    for preload, timings in results.items():
+        print(f"{'preloaded' if preload else 'lazy':<10} {json.dumps(timings)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Document listing benchmark at 10k documents
+
+Fills a scratch manifest with synthetic entries and times a full listing through
+DocumentManifest.list(), which is a single HGETALL, and single pages through
+DocumentManifest.page(), a sorted-set range read plus an HMGET whose cost
+follows the page size rather than the manifest size. It also times the encode of
+the JSON manifest object that is rewritten to S3 on every ingest. For
+comparison, the old listing path (one S3 listing plus a list_objects_v2 and a
+head_object per document) is timed on a sample of real documents and projected
+to the same document count.
+
+Requires a running Redis (REDIS_HOST / REDIS_PORT); the S3 comparison also needs
+the AWS credentials the app uses:
+
+    python -m benchmarks.bench_document_listing
+
+BENCH_DOCUMENTS sets the manifest size (default 10000) and BENCH_S3_SAMPLE how
+many real documents the old path is timed on (default 20, 0 to skip).
+"""
+import json
+import os
+import statistics
+import time
+import uuid
+
+from app.backend.manifest import DocumentManifest
+from app.backend.storage import S3Storage
+
+DOCUMENTS = int(os.getenv("BENCH_DOCUMENTS", "10000"))
+S3_SAMPLE = int(os.getenv("BENCH_S3_SAMPLE", "20"))
+PAGE_SIZE = int(os.getenv("BENCH_PAGE_SIZE", "50"))
+ROUNDS = 20
+
+
+def synthetic_entry(index: int) -> dict:
+    document_id = f"bench_document_{index:06d}_20250308_164434"
+    return {
+        "document_id": document_id,
+        "original_filename": f"bench_document_{index:06d}.pdf",
+        "processing_date": f"2025-03-08 {index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}",
+        "pdf_url": f"https://bucket.s3.us-east-1.amazonaws.com/documents/pdf/{document_id}/bench_document_{index:06d}.pdf",
+        "markdown_url": f"https://bucket.s3.us-east-1.amazonaws.com/documents/markdown/{document_id}/bench_document_{index:06d}.md",
+        "content_sha256": uuid.uuid4().hex * 2,
+        "processor": "docling",
+        "pipeline_profile": "balanced"
+    }
+
+
+def timed(function, rounds: int = ROUNDS):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def time_s3_listing():
+    """Time the old N+1 path on real documents and project it to DOCUMENTS"""
+    storage = S3Storage()
+
+    list_seconds, document_ids = timed(storage.list_documents, rounds=3)
+    sample = document_ids[:S3_SAMPLE]
+    if not sample:
+        print("old path: no documents in S3 to sample")
+        return
+    per_document, _ = timed(lambda: [storage.get_document_metadata(document_id) for document_id in sample], rounds=3)
+    per_document /= len(sample)
+    print(f"old path: listing {list_seconds * 1000:.1f} ms + {per_document * 1000:.1f} ms per document "
+          f"-> {(list_seconds + per_document * DOCUMENTS):.1f} s projected for {DOCUMENTS} documents "
+          f"({2 * DOCUMENTS + 1} S3 requests)")
+
+
+def main():
+    manifest = DocumentManifest(manifest_key=f"bench_manifest:{uuid.uuid4().hex}")
+    scratch_keys = [manifest.manifest_key, manifest.loaded_key, *manifest.index_keys.values()]
+    try:
+        entries = [synthetic_entry(index) for index in range(DOCUMENTS)]
+        pipeline = manifest.redis_client.pipeline()
+        for batch_start in range(0, DOCUMENTS, 1000):
+            batch = entries[batch_start:batch_start + 1000]
+            pipeline.hset(manifest.manifest_key, mapping={entry["document_id"]: json.dumps(entry) for entry in batch})
+        # Marked loaded, so the listing never falls back to the app's stored manifest
+        pipeline.set(manifest.loaded_key, 1)
+        pipeline.execute()
+
+        list_seconds, documents = timed(manifest.list)
+        assert len(documents) == DOCUMENTS
+        encode_seconds, payload = timed(lambda: json.dumps(entries).encode("utf-8"))
+
+        manifest.rebuild_indexes()
+        first_seconds, (_, cursor) = timed(lambda: manifest.page(PAGE_SIZE))
+        # A cursor deep into the listing costs the same range read as the first page
+        deep_cursor = cursor
+        for _ in range(DOCUMENTS // PAGE_SIZE // 2):
+            _, deep_cursor = manifest.page(PAGE_SIZE, deep_cursor)
+        deep_seconds, _ = timed(lambda: manifest.page(PAGE_SIZE, deep_cursor))
+        name_seconds, _ = timed(lambda: manifest.page(PAGE_SIZE, sort="name", order="asc", name="bench_document_005"))
+
+        print(f"manifest: list {len(documents)} documents in {list_seconds * 1000:.1f} ms (1 Redis request)")
+        print(f"manifest: page of {PAGE_SIZE} in {first_seconds * 1000:.2f} ms first, "
+              f"{deep_seconds * 1000:.2f} ms mid-listing, {name_seconds * 1000:.2f} ms by filename prefix")
+        print(f"manifest: S3 object {len(payload) / 1024:.0f} KiB, encoded in {encode_seconds * 1000:.1f} ms per ingest")
+    finally:
+        manifest.redis_client.delete(*scratch_keys)
+
+    if S3_SAMPLE:
+        time_s3_listing()
+
+
+if __name__ == "__main__":
+    main()
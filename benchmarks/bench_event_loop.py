@@ -0,0 +1,72 @@
+"""
+Event loop responsiveness check for the async API
+
+Fires a batch of /ask_question calls that stay pending (run it with the QA
+workers stopped, or slowed down) and measures how long `/` takes to answer
+while they wait. Exits non-zero if the p99 latency of `/` exceeds the budget.
+
+Requires a running API and a processed document:
+
+    python -m benchmarks.bench_event_loop <document_id>
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+PENDING_CALLS = int(os.getenv("BENCH_PENDING_CALLS", "200"))
+PROBES = 50
+BUDGET_MS = 10.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main(document_id: str) -> int:
+    limits = httpx.Limits(max_connections=PENDING_CALLS + 10)
+    async with httpx.AsyncClient(base_url=API_URL, timeout=60, limits=limits) as client:
+        pending = [
+            asyncio.create_task(client.post(
+                "/ask_question",
+                json={"document_id": document_id, "question": f"What is item {i}?"}
+            ))
+            for i in range(PENDING_CALLS)
+        ]
+        
+        # Give the API time to fetch the document and park every call on its reply list
+        await asyncio.sleep(2)
+        
+        latencies = []
+        for _ in range(PROBES):
+            start = time.perf_counter()
+            response = await client.get("/")
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+            await asyncio.sleep(0.02)
+        
+        still_pending = sum(1 for task in pending if not task.done())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    
+    p50 = percentile(latencies, 50)
+    p99 = percentile(latencies, 99)
+    print(f"pending QA calls: {still_pending}/{PENDING_CALLS}")
+    print(f"GET / p50={p50:.2f} ms p99={p99:.2f} ms (budget {BUDGET_MS:.0f} ms)")
+    
+    if still_pending < PENDING_CALLS:
+        print("WARNING: some QA calls finished early; stop the QA workers for a meaningful run")
+    return 0 if p99 <= BUDGET_MS else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(asyncio.run(main(sys.argv[1])))
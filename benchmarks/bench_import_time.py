@@ -0,0 +1,67 @@
+"""
+Import-time benchmark
+
+Imports each backend entry module in a fresh interpreter under
+`python -X importtime` and reports the wall-clock import time together with
+the slowest modules by cumulative time. Nothing in the import path should touch
+the network, so AWS credentials are removed from the child environment: an
+import that still needs S3 fails loudly instead of silently timing a network
+round trip.
+
+    python -m benchmarks.bench_import_time
+
+BENCH_MODULES overrides the modules measured (comma-separated) and
+BENCH_TOP the number of slowest modules listed per import (default 10).
+"""
+import os
+import subprocess
+import sys
+import time
+
+MODULES = os.getenv("BENCH_MODULES", "app.backend.s3_utils,app.backend.utils,app.backend.main").split(",")
+TOP = int(os.getenv("BENCH_TOP", "10"))
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+NETWORK_ENV = ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION", "AWS_S3_BUCKET_NAME")
+
+
+def parse_importtime(stderr: str):
+    """Rows of (cumulative microseconds, module) from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.strip()))
+    return rows
+
+
+def measure(module: str):
+    env = {name: value for name, value in os.environ.items() if name not in NETWORK_ENV}
+    # Disable load_dotenv so a local .env cannot put the credentials back
+    code = f"import dotenv; dotenv.load_dotenv = lambda *args, **kwargs: False; import {module}"
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+    return result, elapsed
+
+
+def main():
+    for module in MODULES:
+        result, elapsed = measure(module)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+            print(f"{module}: import failed: {error}")
+            continue
+
+        rows = parse_importtime(result.stderr)
+        own = next((cumulative for cumulative, name in rows if name == module), 0)
+        print(f"{module}: {own / 1000:.0f} ms cumulative import, {elapsed * 1000:.0f} ms interpreter wall clock")
+        for cumulative, name in sorted(rows, reverse=True)[:TOP]:
+            print(f"    {cumulative / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Page-parallel Docling conversion benchmark
+
+Converts the bundled sample PDFs and a synthetic many-page PDF (the AMZN
+earnings release repeated) once on a single converter and once per process
+pool size, and reports wall-clock time and speedup. Pools are warmed up first
+so model loading is not counted. Nothing is uploaded to S3.
+
+    python -m benchmarks.bench_page_parallel
+
+BENCH_SYNTHETIC_PAGES sets the synthetic page count (default 200) and
+BENCH_POOL_SIZES the pool sizes to try (default "2,4,8,16", capped at CPU count).
+"""
+import glob
+import os
+import tempfile
+import time
+
+import pypdfium2 as pdfium
+
+from app.backend.pdf_processor import PDFProcessor
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "data", "documents", "pdf_sources")
+SYNTHETIC_PAGES = int(os.getenv("BENCH_SYNTHETIC_PAGES", "200"))
+POOL_SIZES = [
+    size for size in (int(value) for value in os.getenv("BENCH_POOL_SIZES", "2,4,8,16").split(","))
+    if size <= (os.cpu_count() or 1)
+]
+
+
+def sample_pdfs():
+    """One path per distinct bundled sample PDF"""
+    seen = {}
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, "*", "raw", "*.pdf"))):
+        seen.setdefault(os.path.basename(path), path)
+    return list(seen.values())
+
+
+def build_synthetic_pdf(source_path: str, pages: int) -> str:
+    """Repeat the source PDF's pages until the document has the requested page count"""
+    source = pdfium.PdfDocument(source_path)
+    target = pdfium.PdfDocument.new()
+    source_pages = len(source)
+    while len(target) < pages:
+        count = min(source_pages, pages - len(target))
+        target.import_pages(source, list(range(count)))
+    
+    path = os.path.join(tempfile.mkdtemp(), f"synthetic_{pages}_pages.pdf")
+    target.save(path)
+    target.close()
+    source.close()
+    return path
+
+
+def build_processor(workers: int) -> PDFProcessor:
+    """Create a processor with the given pool size and wait until every worker has loaded its models"""
+    os.environ["PDF_PARALLEL_WORKERS"] = str(workers)
+    os.environ["PDF_PARALLEL_MIN_PAGES"] = "2"
+    processor = PDFProcessor()
+    # The same warm-up the ingest worker runs at startup: in-process converters and every page worker
+    processor.preload()
+    return processor
+
+
+def time_conversion(processor: PDFProcessor, path: str) -> float:
+    start = time.perf_counter()
+    processor.convert_pdf(path)
+    return time.perf_counter() - start
+
+
+def main():
+    pdfs = sample_pdfs()
+    amzn = next(path for path in pdfs if "AMZN" in path)
+    pdfs.append(build_synthetic_pdf(amzn, SYNTHETIC_PAGES))
+    
+    sequential = build_processor(0)
+    # The first conversion initializes the in-process pipeline; keep it out of the numbers
+    sequential.convert_pdf(amzn)
+    baselines = {path: time_conversion(sequential, path) for path in pdfs}
+    
+    results = {path: {} for path in pdfs}
+    for workers in POOL_SIZES:
+        processor = build_processor(workers)
+        for path in pdfs:
+            results[path][workers] = time_conversion(processor, path)
+        processor.page_pool.shutdown()
+    
+    header = f"{'pdf':<40} {'pages':>6} {'1 proc s':>9}" + "".join(f" {f'{w} procs':>14}" for w in POOL_SIZES)
+    print(header)
+    for path in pdfs:
+        document = pdfium.PdfDocument(path)
+        pages = len(document)
+        document.close()
+        row = f"{os.path.basename(path)[:40]:<40} {pages:>6} {baselines[path]:>9.2f}"
+        for workers in POOL_SIZES:
+            elapsed = results[path][workers]
+            row += f" {elapsed:>7.2f} ({baselines[path] / elapsed:>4.1f}x)"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Reply latency benchmark for the per-request response lists
+
+Starts N concurrent waiters, has a fake worker publish each reply and measures
+the time between the publish and the waiter waking up. Abandoned replies are
+left behind between rounds to show that they do not slow anyone down.
+
+Requires a running Redis (REDIS_HOST / REDIS_PORT):
+
+    python -m benchmarks.bench_reply_latency
+"""
+import statistics
+import threading
+import time
+import uuid
+
+from app.backend.redis_service import RedisService
+
+WAITER_COUNTS = [1, 10, 50, 200]
+ABANDONED_PER_ROUND = 500
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_round(redis_service: RedisService, waiters: int):
+    """Run one round with the given number of concurrent waiters"""
+    request_ids = [str(uuid.uuid4()) for _ in range(waiters)]
+    latencies = []
+    lock = threading.Lock()
+    ready = threading.Barrier(waiters + 1)
+    
+    def wait(request_id):
+        ready.wait()
+        response = redis_service.get_qa_response(request_id, timeout=10)
+        woke_at = time.time()
+        if response:
+            with lock:
+                latencies.append(woke_at - response["timestamp"])
+    
+    threads = [threading.Thread(target=wait, args=(rid,)) for rid in request_ids]
+    for thread in threads:
+        thread.start()
+    
+    ready.wait()
+    time.sleep(0.2)  # let every waiter reach BLPOP
+    
+    for request_id in request_ids:
+        redis_service.publish_qa_response(request_id, "answer", {"total_cost": 0})
+    
+    for thread in threads:
+        thread.join()
+    
+    # Leave replies nobody collects, like requests the API gave up on
+    for _ in range(ABANDONED_PER_ROUND):
+        redis_service.publish_qa_response(str(uuid.uuid4()), "abandoned", {"total_cost": 0})
+    
+    return latencies
+
+
+def main():
+    redis_service = RedisService()
+    
+    print(f"{'waiters':>8} {'p50 ms':>10} {'p99 ms':>10} {'mean ms':>10}")
+    for waiters in WAITER_COUNTS:
+        latencies = run_round(redis_service, waiters)
+        if not latencies:
+            print(f"{waiters:>8} {'timeout':>10}")
+            continue
+        print(
+            f"{waiters:>8} "
+            f"{percentile(latencies, 50) * 1000:>10.2f} "
+            f"{percentile(latencies, 99) * 1000:>10.2f} "
+            f"{statistics.mean(latencies) * 1000:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
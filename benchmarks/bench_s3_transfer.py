@@ -0,0 +1,74 @@
+"""
+S3 transfer benchmark: serial calls versus the pooled S3TransferClient
+
+Uploads, heads and downloads BENCH_OBJECTS small objects (about the size of
+extracted page images) under a scratch prefix, once one call at a time and once
+as concurrent batches, then deletes them. Point it at a local S3 stand-in to
+run it offline and without AWS costs, e.g. a moto server:
+
+    moto_server -p 5000 &
+    AWS_S3_ENDPOINT_URL=http://localhost:5000 AWS_ACCESS_KEY_ID=test \\
+    AWS_SECRET_ACCESS_KEY=test AWS_REGION=us-east-1 AWS_S3_BUCKET_NAME=bench \\
+        python -m benchmarks.bench_s3_transfer
+
+With an endpoint URL set the bucket is created if it does not exist.
+BENCH_OBJECTS (default 64) and BENCH_OBJECT_BYTES (default 200000) size the run;
+S3_MAX_POOL_CONNECTIONS sets the pool and batch concurrency.
+"""
+import os
+import time
+import uuid
+
+from app.backend.s3_transfer import S3TransferClient
+from app.backend.s3_utils import get_s3_client, AWS_S3_BUCKET_NAME, AWS_S3_ENDPOINT_URL
+
+OBJECTS = int(os.getenv("BENCH_OBJECTS", "64"))
+OBJECT_BYTES = int(os.getenv("BENCH_OBJECT_BYTES", "200000"))
+
+
+def timed(label: str, function, serial_seconds: float = None) -> float:
+    start = time.perf_counter()
+    results = function()
+    elapsed = time.perf_counter() - start
+    failures = [result for result in (results.values() if isinstance(results, dict) else []) if isinstance(result, Exception)]
+    speedup = f" ({serial_seconds / elapsed:.1f}x)" if serial_seconds else ""
+    print(f"{label:<28} {elapsed * 1000:>9.1f} ms{speedup}" + (f"  {len(failures)} failed" if failures else ""))
+    return elapsed
+
+
+def main():
+    client = get_s3_client()
+    if AWS_S3_ENDPOINT_URL:
+        try:
+            client.head_bucket(Bucket=AWS_S3_BUCKET_NAME)
+        except Exception:
+            client.create_bucket(Bucket=AWS_S3_BUCKET_NAME)
+
+    transfer = S3TransferClient()
+    prefix = f"benchmarks/transfer/{uuid.uuid4().hex}"
+    body = os.urandom(OBJECT_BYTES)
+    serial_keys = [f"{prefix}/serial/{index}.png" for index in range(OBJECTS)]
+    batch_keys = [f"{prefix}/batch/{index}.png" for index in range(OBJECTS)]
+    print(f"{OBJECTS} objects of {OBJECT_BYTES} bytes, {transfer.max_workers} pooled connections, "
+          f"endpoint {AWS_S3_ENDPOINT_URL or 'AWS'}")
+
+    try:
+        serial = timed("upload, one at a time", lambda: [transfer.put(key, body, "image/png") for key in serial_keys])
+        timed("upload_many", lambda: transfer.upload_many({key: (body, "image/png") for key in batch_keys}), serial)
+
+        serial = timed("head, one at a time", lambda: [transfer.head(key) for key in serial_keys])
+        timed("head_many", lambda: transfer.head_many(batch_keys), serial)
+
+        serial = timed("get, one at a time", lambda: [transfer.get(key) for key in serial_keys])
+        timed("get_many", lambda: transfer.get_many(batch_keys), serial)
+    finally:
+        keys = serial_keys + batch_keys
+        for start in range(0, len(keys), 1000):
+            client.delete_objects(
+                Bucket=AWS_S3_BUCKET_NAME,
+                Delete={"Objects": [{"Key": key} for key in keys[start:start + 1000]]}
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Worker throughput benchmark for the batched, concurrent stream consumer
+
+Runs the consumer against a stub LLM that sleeps for a fixed latency and
+reports requests/sec for each in-flight limit. Every round uses its own
+stream so production streams are left alone.
+
+Requires a running Redis (REDIS_HOST / REDIS_PORT):
+
+    python -m benchmarks.bench_worker_throughput
+"""
+import json
+import os
+import threading
+import time
+
+from app.backend.redis_service import RedisService
+
+IN_FLIGHT_LIMITS = [1, 2, 4, 8, 16, 32]
+REQUESTS_PER_ROUND = int(os.getenv("BENCH_REQUESTS", "64"))
+STUB_LATENCY = float(os.getenv("BENCH_LLM_LATENCY", "0.25"))
+
+
+class StubLLMService:
+    """Stands in for LLMService; only waits like a remote model would"""
+    
+    def generate_summary(self, document_content: str, model_id: str):
+        time.sleep(STUB_LATENCY)
+        return "stub summary", {"model": model_id, "total_cost": 0}, False
+
+
+def run_round(redis_service: RedisService, max_in_flight: int) -> float:
+    """Publish a burst of requests and time how long the consumer takes to answer all of them"""
+    stream = f"bench_summary_requests_{max_in_flight}"
+    group = f"bench_summary_processors_{max_in_flight}"
+    redis_service.redis_client.delete(stream)
+    redis_service.redis_client.xgroup_create(stream, group, mkstream=True, id='0')
+    
+    llm_service = StubLLMService()
+    
+    def process(data):
+        summary, cost_info, failed = llm_service.generate_summary("", data["model_id"])
+        redis_service.publish_summary_response(data["request_id"], summary, cost_info, error=failed)
+    
+    request_ids = []
+    for _ in range(REQUESTS_PER_ROUND):
+        message = redis_service._build_summary_request("bench", "0" * 64, "stub")
+        redis_service.redis_client.xadd(stream, {"data": json.dumps(message)})
+        request_ids.append(message["request_id"])
+    
+    start = time.perf_counter()
+    stop = threading.Event()
+    consumer = threading.Thread(
+        target=redis_service._consume_stream,
+        args=(stream, group, f"bench_worker_{max_in_flight}", process, max_in_flight, stop),
+        daemon=True
+    )
+    consumer.start()
+    
+    for request_id in request_ids:
+        if redis_service.get_summary_response(request_id, timeout=60) is None:
+            raise RuntimeError(f"Request {request_id} was not answered")
+    elapsed = time.perf_counter() - start
+    
+    # Stop the consumer before its stream and group go away, or its reads fail with NOGROUP
+    stop.set()
+    consumer.join()
+    redis_service.redis_client.delete(stream)
+    return REQUESTS_PER_ROUND / elapsed
+
+
+def main():
+    redis_service = RedisService()
+    
+    print(f"stub LLM latency: {STUB_LATENCY * 1000:.0f} ms, {REQUESTS_PER_ROUND} requests per round")
+    print(f"{'in-flight':>10} {'req/s':>10} {'speedup':>10}")
+    baseline = None
+    for max_in_flight in IN_FLIGHT_LIMITS:
+        throughput = run_round(redis_service, max_in_flight)
+        baseline = baseline or throughput
+        print(f"{max_in_flight:>10} {throughput:>10.2f} {throughput / baseline:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
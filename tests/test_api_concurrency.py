@@ -0,0 +1,82 @@
+import asyncio
+import json
+import statistics
+import time
+
+import fakeredis
+import httpx
+import pytest
+
+DOCUMENT_ID = "doc-1"
+PENDING_QUESTIONS = 200
+ROOT_LATENCY_BOUND = 0.010
+
+
+class StaticDocumentStore:
+    """Serves one document without touching storage"""
+
+    async def get_document_content(self, document_id):
+        if document_id != DOCUMENT_ID:
+            return None
+        return {"content": "Revenue grew in 2024.", "metadata": {"original_filename": "report.pdf"}}
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_STORAGE_DIR", str(tmp_path))
+    from app.backend import main
+
+    server = fakeredis.FakeServer()
+    # Every pending question holds a connection in BLPOP, as with the real pool
+    redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True, max_connections=1000)
+    monkeypatch.setattr(main.redis_service, "redis_client", redis_client)
+    monkeypatch.setattr(main.qa_cache, "redis_client", redis_client)
+    monkeypatch.setattr(main, "document_store", StaticDocumentStore())
+    return main, fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+async def wait_for_requests(worker_client, stream, count, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while worker_client.xlen(stream) < count:
+        assert time.perf_counter() < deadline, f"only {worker_client.xlen(stream)} of {count} requests published"
+        await asyncio.sleep(0.01)
+
+
+def test_root_stays_responsive_while_questions_are_pending(api):
+    main, worker_client = api
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            questions = [
+                asyncio.create_task(client.post("/ask_question", json={
+                    "document_id": DOCUMENT_ID, "question": f"What was revenue in quarter {index}?"
+                }))
+                for index in range(PENDING_QUESTIONS)
+            ]
+            stream = main.redis_service.qa_request_stream
+            await wait_for_requests(worker_client, stream, PENDING_QUESTIONS)
+
+            latencies = []
+            for _ in range(20):
+                started = time.perf_counter()
+                response = await client.get("/")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+            assert not any(task.done() for task in questions)
+
+            # Answer every request the way a QA worker would
+            for _, fields in worker_client.xrange(stream):
+                request = json.loads(fields["data"])
+                reply = {"request_id": request["request_id"], "answer": "It grew.", "cost": {}, "error": False}
+                worker_client.rpush(f"{main.redis_service.qa_response_prefix}:{request['request_id']}", json.dumps(reply))
+
+            responses = await asyncio.gather(*questions)
+            return latencies, responses
+
+    latencies, responses = asyncio.run(scenario())
+
+    assert statistics.median(latencies) < ROOT_LATENCY_BOUND
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json()["answer"] == "It grew." for response in responses)
@@ -0,0 +1,70 @@
+import fakeredis
+import pytest
+
+from app.backend.llm_service import LLMService, SUMMARY_FAILED
+from app.backend.result_cache import ChunkSummaryStore
+
+MODEL_ID = "huggingface/HuggingFaceH4/zephyr-7b-beta"
+
+# Ten paragraphs of distinct text, long enough to take the map-reduce path
+DOCUMENT = "\n\n".join(f"paragraph{index} " * 900 for index in range(10))
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def service():
+    return LLMService()
+
+
+@pytest.fixture
+def chunk_store():
+    return ChunkSummaryStore(fakeredis.FakeRedis(decode_responses=True))
+
+
+def reply_with(service, failing_part=None):
+    """Answer every call except the chunk call for failing_part, which gets a 500"""
+    calls = []
+
+    def post(url, headers=None, json=None):
+        calls.append(json["inputs"])
+        if failing_part is not None and f"part {failing_part} of" in json["inputs"]:
+            return FakeResponse(500)
+        return FakeResponse(200, [{"generated_text": "fine"}])
+
+    service.http_session.post = post
+    return calls
+
+
+def test_failed_chunk_is_not_stored_and_fails_the_summary(service, chunk_store):
+    chunks = service._chunk_document(DOCUMENT)
+    reply_with(service, failing_part=2)
+
+    summary, _, failed = service.generate_summary(DOCUMENT, chunk_store=chunk_store)
+
+    assert failed
+    assert summary == SUMMARY_FAILED
+    stored = chunk_store.get_many(MODEL_ID, chunks)
+    assert stored[1] is None
+    assert all(summary == "fine" for index, summary in enumerate(stored) if index != 1)
+
+
+def test_retry_only_resends_the_failed_chunk(service, chunk_store):
+    reply_with(service, failing_part=2)
+    service.generate_summary(DOCUMENT, chunk_store=chunk_store)
+
+    calls = reply_with(service)
+    summary, _, failed = service.generate_summary(DOCUMENT, chunk_store=chunk_store)
+
+    assert not failed
+    assert summary == "fine"
+    chunk_calls = [prompt for prompt in calls if "Please summarize the following part" in prompt]
+    assert len(chunk_calls) == 1
+    assert "part 2 of" in chunk_calls[0]
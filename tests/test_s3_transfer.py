@@ -0,0 +1,67 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from app.backend.s3_transfer import S3TransferClient
+
+BUCKET = "transfer-test"
+
+
+@pytest.fixture
+def transfer():
+    with mock_aws():
+        client = boto3.client(
+            "s3", region_name="us-east-1",
+            aws_access_key_id="test", aws_secret_access_key="test"
+        )
+        client.create_bucket(Bucket=BUCKET)
+        transfer = S3TransferClient(client=client, bucket=BUCKET, max_workers=4)
+        yield transfer
+        transfer.executor.shutdown()
+
+
+def test_upload_many_returns_each_key(transfer):
+    items = {f"images/{index}.png": (bytes([index]) * 100, "image/png") for index in range(8)}
+
+    results = transfer.upload_many(items)
+
+    assert results == {key: key for key in items}
+    assert transfer.head("images/3.png")["ContentType"] == "image/png"
+
+
+def test_upload_many_reports_failures_per_key(transfer):
+    # A body boto3 cannot send fails that upload only
+    items = {"ok.bin": (b"data", None), "bad.bin": (12345, None)}
+
+    results = transfer.upload_many(items)
+
+    assert results["ok.bin"] == "ok.bin"
+    assert isinstance(results["bad.bin"], Exception)
+    assert transfer.get("ok.bin") == b"data"
+    assert transfer.get("bad.bin") is None
+
+
+def test_head_many_and_get_many_map_missing_keys_to_none(transfer):
+    transfer.upload_many({"a.txt": (b"alpha", "text/plain"), "b.txt": (b"beta!", "text/plain")})
+    keys = ["a.txt", "missing.txt", "b.txt"]
+
+    heads = transfer.head_many(keys)
+    bodies = transfer.get_many(keys)
+
+    assert list(heads) == keys
+    assert heads["a.txt"]["ContentLength"] == 5
+    assert heads["missing.txt"] is None
+    assert bodies == {"a.txt": b"alpha", "missing.txt": None, "b.txt": b"beta!"}
+
+
+def test_batches_return_exceptions_instead_of_raising(transfer):
+    other = S3TransferClient(client=transfer.client, bucket="no-such-bucket", max_workers=2)
+    try:
+        results = other.get_many(["a.txt", "b.txt"])
+        uploads = other.upload_many({"c.txt": (b"c", None)})
+    finally:
+        other.executor.shutdown()
+
+    assert all(isinstance(result, Exception) for result in results.values())
+    assert list(results) == ["a.txt", "b.txt"]
+    assert isinstance(uploads["c.txt"], Exception)